@@ -0,0 +1,166 @@
+"""
+Times the script locator_func uses to leave out repeated and unwanted
+elements against the one it used before, which compared every element to
+every other one.
+
+The page has --candidates elements.  The elements searched are all of
+them, then the first half again, the way several xpaths find the same
+elements, and every tenth one is unwanted, the way nots are.
+
+To run it in a browser through WebDriver:
+
+    python benchmarks/dedupe_benchmark.py --browser chrome
+
+or to write a page that runs it when it's opened:
+
+    python benchmarks/dedupe_benchmark.py --page dedupe_benchmark.html
+"""
+import argparse
+import json
+import os.path
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from vision import visioninterpreter
+
+# What locator_func used to run
+quadratic_dedupe_js = """
+var seen = [];
+var matches = arguments[0];
+var dont_want = arguments[1];
+return matches.filter(function(el){
+    if(seen.filter(function(x){return x === el;}).length != 0 || dont_want.filter(function(x){return x === el;}).length != 0) {
+        return false;
+    } else {
+        seen.push(el);
+        return true;
+    }
+});
+"""
+
+scripts = [
+    ('quadratic', quadratic_dedupe_js),
+    ('identity set', visioninterpreter.dedupe_js),
+]
+
+# Makes the candidates, and returns the elements searched and the ones
+# that aren't wanted
+setup_js = """
+var candidates = arguments[0];
+var container = document.getElementById('candidates');
+if (!container) {
+    container = document.createElement('div');
+    container.id = 'candidates';
+    document.body.appendChild(container);
+    for (var i = 0; i < candidates; i++) {
+        var el = document.createElement('span');
+        el.textContent = 'Candidate ' + i;
+        container.appendChild(el);
+    }
+}
+var elements = Array.prototype.slice.call(container.childNodes);
+var unwanted = elements.filter(function(el, i) { return i % 10 == 0; });
+return [elements.concat(elements.slice(0, Math.floor(elements.length / 2))), unwanted];
+"""
+
+# Runs the script in arguments[0] on the candidates, arguments[1] times,
+# and returns how long each run took, in seconds
+in_page_js = """
+var run = new Function(arguments[0]);
+var searched = (new Function(arguments[2])).apply(null, [arguments[3]]);
+var times = [];
+var found = 0;
+for (var i = 0; i < arguments[1]; i++) {
+    var start = new Date().getTime();
+    found = run.apply(null, searched).length;
+    times.push((new Date().getTime() - start) / 1000);
+}
+return [found, times];
+"""
+
+page_template = """<!DOCTYPE html>
+<html>
+<head><title>Dedupe benchmark</title></head>
+<body>
+<pre id="results">Running...</pre>
+<script>
+window.onload = function() {
+    var scripts = %(scripts)s;
+    var inPage = new Function(%(in_page_js)s);
+    var lines = [];
+    for (var i = 0; i < scripts.length; i++) {
+        var result = inPage(scripts[i][1], %(runs)d, %(setup_js)s, %(candidates)d);
+        lines.push(scripts[i][0] + ': ' + result[0] + ' unique, best of %(runs)d ' +
+            Math.min.apply(null, result[1]).toFixed(3) + ' seconds');
+    }
+    document.getElementById('results').textContent = lines.join('\\n');
+};
+</script>
+</body>
+</html>
+"""
+
+def write_page(filename, candidates, runs):
+    with open(filename, 'w') as page:
+        page.write(page_template % {
+            'scripts': json.dumps(scripts),
+            'in_page_js': json.dumps(in_page_js),
+            'setup_js': json.dumps(setup_js),
+            'candidates': candidates,
+            'runs': runs})
+
+def run_in_browser(browser, candidates, runs):
+    from selenium import webdriver
+    driver = {
+        'chrome': webdriver.Chrome,
+        'firefox': webdriver.Firefox,
+        'internetexplorer': webdriver.Ie,
+    }[browser]()
+    try:
+        driver.get('about:blank')
+        for name, script in scripts:
+            found, times = driver.execute_script(in_page_js, script, runs, setup_js, candidates)
+            print "%s: %d unique, best of %d in the page %.3f seconds" % (name, found, runs, min(times))
+
+            # What locator_func sees, with the elements going to and from
+            # the browser
+            searched, unwanted = driver.execute_script(setup_js, candidates)
+            times = []
+            for i in range(runs):
+                start = time.time()
+                driver.execute_script(script, searched, unwanted)
+                times.append(time.time() - start)
+            print "%s: best of %d through WebDriver %.3f seconds" % (name, runs, min(times))
+    finally:
+        driver.quit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument(
+        '--candidates',
+        type=int,
+        help='How many elements the page has',
+        default=10000)
+    parser.add_argument(
+        '--runs',
+        type=int,
+        help='How many times each script is run; the best time is reported',
+        default=3)
+    parser.add_argument(
+        '--browser',
+        help='The browser to run the benchmark in',
+        choices=['chrome', 'firefox', 'internetexplorer'],
+        default='chrome')
+    parser.add_argument(
+        '--page',
+        help="Write a page that runs the benchmark when it's opened to this file, instead of running it")
+    arguments = parser.parse_args()
+    if arguments.page:
+        write_page(arguments.page, arguments.candidates, arguments.runs)
+    else:
+        run_in_browser(arguments.browser, arguments.candidates, arguments.runs)
+
+if __name__ == "__main__":
+    main()
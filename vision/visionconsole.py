@@ -1,5 +1,9 @@
 import visioninterpreter
+import visionscanner
+import visionparser
+import visionexceptions
 import argparse
+import multiprocessing
 import os
 import os.path
 import sys
@@ -65,6 +69,83 @@ def get_args(arguments=None, parse_help=True):
                 'one set of breakpoints.  The files available to have '
                 'breakpoints placed are: %s' % arguments.testfiles),
             action='append')
+    parser.add_argument(
+        '--tests-dir',
+        help='The directory that tests are loaded from.',
+        default=os.getcwd())
+    parser.add_argument(
+        '--check',
+        help=(
+            "Scan and parse the test files without running them, and report "
+            "any problems found.  No browser is started.  If no testfiles "
+            "are given, every .vision file under the tests directory is "
+            "checked."),
+        action='store_true',
+        default=False)
+    parser.add_argument(
+        '--check-processes',
+        type=int,
+        help='The number of processes used to check files.  Defaults to the number of CPUs.',
+        default=None)
+    parser.add_argument(
+        '--parse-cache-dir',
+        help=(
+            "The directory where the tokens of loaded test files are saved, "
+            "so that unchanged files don't need to be scanned again.  By "
+            "default they aren't saved."),
+        default="")
+    parser.add_argument(
+        '--compact-history',
+        help=(
+            "Once commands have run, let go of their tokens and elements, "
+            "and keep only a summary of those that scopes and variables "
+            "don't need.  This keeps long sessions from growing without "
+            "bound."),
+        action='store_true',
+        default=False)
+    parser.add_argument(
+        '--locator',
+        help=(
+            "How elements are found: 'webdriver' searches for each xpath "
+            "with its own WebDriver call, 'browser' searches for them all, "
+            "and checks that they're displayed, with a single script"),
+        choices=sorted(visioninterpreter.VisionInterpreter.locators),
+        default='webdriver')
+    parser.add_argument(
+        '--batch-filters',
+        help=(
+            "Check that the elements found are displayed, and have the "
+            "right text, for all of them at once with one script, rather "
+            "than one WebDriver call at a time"),
+        action='store_true',
+        default=False)
+    parser.add_argument(
+        '--hover',
+        help=(
+            "Which elements to move the mouse over once they're found: "
+            "'always' every one, including those a command's element is "
+            "in, 'subject' only the element a command is about, 'verbs' "
+            "only that element, and only for commands like Click and "
+            "Hover over, or 'never'.  Hover over always moves the mouse over "
+            "its element, whatever this is"),
+        choices=visioninterpreter.VisionInterpreter.hover_policies,
+        default='always')
+    parser.add_argument(
+        '--reuse-subjects',
+        help=(
+            "Use the element found for a command's subject again for the "
+            "next commands about an equivalent subject, as long as it and "
+            "the elements it was found in are still displayed"),
+        action='store_true',
+        default=False)
+    parser.add_argument(
+        '--memoize-locators',
+        help=(
+            "Count changes to the page, and when a command is retried "
+            "before the page has changed, use what was found the last time "
+            "instead of searching again"),
+        action='store_true',
+        default=False)
     parser.add_argument(
         '--debug',
         help='Sets vision to print tracebacks when commands fail',
@@ -75,6 +156,14 @@ def get_args(arguments=None, parse_help=True):
         help='Sets vision to print timing information when a command takes longer than acceptable-time',
         action='store_true',
         default=False)
+    parser.add_argument(
+        '--xpath-report',
+        help=(
+            "When vision finishes, print how many xpaths each type of "
+            "noun compiled to, and how many were left to search once "
+            "repeated and redundant ones were left out"),
+        action='store_true',
+        default=False)
     parser.add_argument(
         '--warning-time',
         type=float,
@@ -127,6 +216,93 @@ def get_args(arguments=None, parse_help=True):
 
     return arguments
 
+def check_file(check_args):
+    """
+    Scans and parses a test file without running it, and returns a list
+    of (filename, line number, message) for each problem found.  This
+    never starts a webdriver.
+    """
+    filename, tests_dir, parse_cache_dir, interpreter_type, parser_type = check_args
+    interpreter = interpreter_type(
+        tests_dir=tests_dir,
+        parse_cache_dir=parse_cache_dir)
+    interpreter.interactivity_enabled = False
+    parser = parser_type(interpreter=interpreter)
+
+    try:
+        with open(os.path.join(tests_dir, filename), 'rb') as testfile:
+            file_scanner = parser.file_scanner_class(
+                filename=filename,
+                filish=testfile,
+                tokenizer=visionscanner.BasicTokenizer(commandtype=visionparser.InterpreterCommand),
+                parser=parser,
+                cache_dir=parse_cache_dir)
+    except IOError as ioe:
+        return [(filename, 0, "The file could not be read: %s" % ioe)]
+    parser.scanner = file_scanner
+
+    problems = []
+    while True:
+        try:
+            command = interpreter.handle_parse()
+        except StopIteration as si:
+            break
+
+        # Commands the parser made, like ends of scopes for dedents, are
+        # reported at the line of the file that caused them
+        lineno = command.lineno if command.scanner is file_scanner else file_scanner.position
+        if command.error:
+            problems.append((
+                filename,
+                lineno,
+                '%s: %s' % (type(command.error).__name__, str(command.error) or command.code.strip())))
+            continue
+
+        # Contexts aren't looked up until the command runs, so look them
+        # up now
+        for context in (child for child in command.children if isinstance(child, visionparser.Context)):
+            if str(context.value) != 'global':
+                try:
+                    context.referent
+                except visionexceptions.UndeclaredContextError as uce:
+                    problems.append((
+                        filename,
+                        lineno,
+                        'UndeclaredContextError: Context "%s" was not defined before use' % context.value))
+    return problems
+
+def check_tests(testfiles, tests_dir, interpreter_type, parser_type, parse_cache_dir="", processes=None):
+    """
+    Checks the test files using a pool of processes, and prints the
+    problems found.  If no testfiles are given, every .vision file in
+    tests_dir is checked.  Returns the number of problems.
+    """
+    if not testfiles:
+        testfiles = sorted(
+            os.path.relpath(os.path.join(directory, filename), tests_dir)
+            for directory, directories, filenames in os.walk(tests_dir)
+            for filename in filenames
+            if filename.endswith('.vision'))
+    testfiles = [
+        filename if "." in filename else filename + ".vision"
+        for filename in testfiles]
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = pool.map(
+            check_file,
+            [(filename, tests_dir, parse_cache_dir, interpreter_type, parser_type) for filename in testfiles],
+            chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    problems = [problem for result in results for problem in result]
+    for problem in problems:
+        print '%s:%d: %s' % problem
+    print "Checked %d files, found %d problems" % (len(testfiles), len(problems))
+    return len(problems)
+
 def main(interpreter_type=visioninterpreter.VisionInterpreter, parser_type=visioninterpreter.InteractiveParser, programs=("vision",),):
     # Print the version
     for program in programs:
@@ -137,12 +313,31 @@ def main(interpreter_type=visioninterpreter.VisionInterpreter, parser_type=visio
     arguments = get_args(parse_help=False)
     arguments = get_args(arguments)
 
+    if arguments.check:
+        # Only check the tests, we don't need a browser for that
+        problems = check_tests(
+            arguments.testfiles,
+            arguments.tests_dir,
+            interpreter_type,
+            parser_type,
+            parse_cache_dir=arguments.parse_cache_dir,
+            processes=arguments.check_processes)
+        sys.exit(1 if problems else 0)
+
     # Make the necessary directories, if they don't exist
     interpreter = interpreter_type(
         verbose=arguments.verbose,
         debug=arguments.debug,
         timing=arguments.timing,
         base_url=arguments.start_url,
+        tests_dir=arguments.tests_dir,
+        parse_cache_dir=arguments.parse_cache_dir,
+        compact_history=arguments.compact_history,
+        locator=arguments.locator,
+        batch_filters=arguments.batch_filters,
+        hover_policy=arguments.hover,
+        reuse_subjects=arguments.reuse_subjects,
+        memoize_locators=arguments.memoize_locators,
         browser_options={
             'remote': arguments.remote,
             'type': arguments.browser})
@@ -153,6 +348,15 @@ def main(interpreter_type=visioninterpreter.VisionInterpreter, parser_type=visio
         maximum_wait=arguments.maximum_time,
         allowable_time=arguments.warning_time)
 
+    # Read the tests, and the tests they require, before the browser
+    # starts, so the run doesn't have to stop for them
+    resolver = interpreter.preload_tests(
+        (arguments.setup_test or []) + arguments.testfiles)
+    for cycle in resolver.cycles:
+        print "Require cycle: %s" % " -> ".join(cycle)
+    for filename, problem in resolver.missing.items():
+        print "Could not preload '%s': %s" % (filename, problem)
+
     try:
         try:
             # Try to make the webdriver, and catch failures with a vague
@@ -253,6 +457,21 @@ def main(interpreter_type=visioninterpreter.VisionInterpreter, parser_type=visio
             # If this fails, there was nothing we could do anyway.
             pass
         interpreter.quit()
+        if arguments.timing:
+            for policy, timing in interpreter.hover_timing.items():
+                print "Hover policy %s: hovered over %d elements in %f seconds, skipped %d" % (
+                    policy,
+                    timing['hovered'],
+                    timing['total'],
+                    timing['skipped'])
+            if arguments.reuse_subjects:
+                print "Reused subjects: %d times, %d went stale, %d not kept" % (
+                    interpreter.subject_elements.hits,
+                    interpreter.subject_elements.stale,
+                    interpreter.subject_elements.misses)
+        if arguments.xpath_report:
+            for line in visioninterpreter.xpath_plans.report():
+                print line
 
 if __name__ == "__main__":
     main()
@@ -12,6 +12,7 @@ import time
 import operator
 import platform
 import math
+import re
 
 # Selenium libraries
 import selenium
@@ -23,6 +24,7 @@ from selenium.common.exceptions import (
     NoAlertPresentException,
     UnexpectedAlertPresentException )
 from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
 
@@ -320,7 +322,11 @@ def compile_row_to_xpath(self, nots=(), base_axis=None, trusteds=()):
         nots=nots,
         trusteds=trusteds)
     xpaths = (base_pattern,) + roles
-    if self.value:
+    if self.value and self.parser.interpreter.locator == 'browser':
+        # The browser finds the rows with the value among all of them,
+        # see row_locator_func
+        pass
+    elif self.value:
         val_comp = self.value.compile()
         # This next looks for the text in text elements or in
         # non-hidden inputs.  I wish it could look in selects, but xpath
@@ -364,6 +370,182 @@ def compile_table_to_xpath(self, nots=(), base_axis=None, trusteds=()):
         print xpath
     return trusteds, (xpath,), nots
 
+_xpath_literal = re.compile(r'"[^"]*"|\'[^\']*\'')
+_xpath_positional = re.compile(r'[0-9]|position\(\)|last\(\)')
+
+def _xpath_outline(xpath):
+    """
+    Returns xpath with its string literals blanked out, and the depth of
+    predicates each character is at
+    """
+    masked = _xpath_literal.sub(lambda match: ' ' * len(match.group(0)), xpath)
+    depths = []
+    depth = 0
+    for char in masked:
+        if char == ']':
+            depth -= 1
+        depths.append(depth)
+        if char == '[':
+            depth += 1
+    return masked, depths
+
+def _xpath_widened(xpath, masked, depths):
+    """
+    Returns xpath with every step outside of a predicate that selects
+    elements (::*) selecting any node (::node()) instead
+    """
+    widened = []
+    start = 0
+    index = masked.find('::*')
+    while index != -1:
+        if depths[index] == 0:
+            widened.append(xpath[start:index])
+            widened.append('::node()')
+            start = index + 3
+        index = masked.find('::*', index + 3)
+    widened.append(xpath[start:])
+    return ''.join(widened)
+
+def _xpath_narrows(xpath, masked, depths, wider):
+    """
+    Whether xpath is wider with only more predicates on its last step
+    """
+    if len(xpath) == len(wider) or not xpath.startswith(wider) or masked[len(wider)] != '[':
+        return False
+    return all(
+        depths[index] or masked[index] in '[]'
+        for index in xrange(len(wider), len(xpath)))
+
+def _xpath_subsumed(xpath, kept):
+    """
+    Whether every node xpath selects is selected by an xpath in kept
+
+    Only xpaths without positional predicates are checked, since
+    widening a step or dropping a predicate renumbers the nodes a
+    positional predicate counts.
+    """
+    masked, depths = _xpath_outline(xpath)
+    if _xpath_positional.search(masked):
+        return False
+    widened = _xpath_widened(xpath, masked, depths)
+    if widened != xpath:
+        if widened in kept:
+            return True
+        masked, depths = _xpath_outline(widened)
+    return any(_xpath_narrows(widened, masked, depths, wider) for wider in kept)
+
+def _optimize_xpaths(xpaths):
+    kept = collections.OrderedDict()
+    for xpath in xpaths:
+        if xpath not in kept and not _xpath_subsumed(xpath, kept):
+            kept[xpath] = True
+    return tuple(kept)
+
+def optimize_plan(plan):
+    """
+    Returns the (trusteds, xpaths, nots) plan with xpaths that can't
+    find anything new left out, and the nots in one union.
+
+    Trusteds and xpaths are searched in order, and an xpath is only left
+    out if it's the same as, or finds a subset of, one searched before
+    it, so the elements found, and their order, stay the same.  Nots
+    are only ever used all together, so they're searched all at once.
+    """
+    trusteds, xpaths, nots = plan
+    nots = _optimize_xpaths(nots)
+    if len(nots) > 1:
+        nots = (" | ".join(nots),)
+    return (_optimize_xpaths(trusteds), _optimize_xpaths(xpaths), nots)
+
+class XPathPlanCache(object):
+    """
+    Keeps the (trusteds, xpaths, nots) that nouns compile to, so that
+    retrying a command, or using the same noun again, doesn't compile
+    it again.  Only the size most recently used plans are kept.
+    """
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.plans = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expansions = {}
+
+    def get(self, key, compile_plan):
+        """
+        Returns the plan for key, calling compile_plan to make it if it
+        isn't kept
+        """
+        try:
+            plan = self.plans.pop(key)
+            self.hits += 1
+        except KeyError, ke:
+            plan = tuple(tuple(part) for part in compile_plan())
+            self.misses += 1
+        self.plans[key] = plan
+        if len(self.plans) > self.size:
+            # Forget the least recently used plan
+            self.plans.popitem(last=False)
+        return plan
+
+    def expanded(self, noun_type, plan, optimized):
+        """
+        Notes how many xpaths a noun of noun_type compiled to, and how
+        many are left to search once the plan is optimized
+        """
+        compiled, searched, nouns = self.expansions.get(noun_type, (0, 0, 0))
+        self.expansions[noun_type] = (
+            compiled + sum(len(part) for part in plan),
+            searched + sum(len(part) for part in optimized),
+            nouns + 1)
+
+    def report(self):
+        """
+        Returns a line for each noun type with how many xpaths its nouns
+        compiled to, and how many they're searched with, on average
+        """
+        lines = []
+        for noun_type, (compiled, searched, nouns) in sorted(self.expansions.items()):
+            lines.append("%s: %.1f xpaths compiled, %.1f searched (%d nouns)" % (
+                noun_type,
+                float(compiled) / nouns,
+                float(searched) / nouns,
+                nouns))
+        return lines
+
+    def clear(self):
+        self.plans.clear()
+
+xpath_plans = XPathPlanCache()
+
+def compile_noun_plan(noun):
+    """
+    Returns what the noun compiles to, optimized, from xpath_plans if it
+    can.
+
+    What a noun compiles to depends on the compile function for its type,
+    which fixes the tags, whether it's a toggle and how text is matched,
+    on its value and axis, and on the interpreter's locator, since rows
+    compile differently for the browser one.  Nouns that bring their own
+    xpaths are compiled every time, as is everything in verbose mode, so
+    the xpaths are printed.
+    """
+    def compile_plan():
+        plan = noun.compile()
+        optimized = optimize_plan(plan)
+        xpath_plans.expanded(noun.type, plan, optimized)
+        return optimized
+
+    if hasattr(noun, 'xpaths') or hasattr(noun, 'trusteds') or noun.parser.interpreter.verbose:
+        return compile_plan()
+    key = (
+        noun.compiles[noun.type],
+        noun.type,
+        noun.value.identifier if noun.value else None,
+        noun.axis,
+        noun.parser.interpreter.locator)
+    return xpath_plans.get(key, compile_plan)
+
 def interpret_selenium_command(self, interpreter, ele=None):
     subj = self.subject
     wait_time = self.wait
@@ -437,6 +619,9 @@ def interpret_selenium_command(self, interpreter, ele=None):
         })
         verb_timing['total'] += total
         self.timing[self.verb] = verb_timing
+        # What the verb did to the page, like focusing or typing into a
+        # field, may not change the DOM generation
+        interpreter.located.clear()
 
     return ret
 
@@ -478,10 +663,88 @@ def interpret_checked_check(self, interpreter, ele=None, expected=True):
         expected,
         ele)
 
-def locator_func(noun, func, finds, nots, filters=None, ordinal=None, replace_id=True, trusteds=()):
-    # Here's a js function to find unique elements in set a that are not
-    # in set b
+# Defines identitySet(), which makes a set of elements that can tell
+# whether an element is in it without comparing it to every element that
+# is.  It's a Set where there are Sets, a WeakMap where there are
+# WeakMaps, and otherwise marks each element added with a property, so
+# releaseIdentitySets() has to be called when done to take the marks off.
+identity_set_js = """
+var identitySets = [];
+
+function identitySet() {
+    var set;
+    if (typeof Set == 'function' && Set.prototype.has) {
+        var elements = new Set();
+        set = {
+            'add': function(el) { elements.add(el); },
+            'has': function(el) { return elements.has(el); },
+            'release': function() {}};
+    } else if (typeof WeakMap == 'function') {
+        var elements = new WeakMap();
+        set = {
+            'add': function(el) { elements.set(el, true); },
+            'has': function(el) { return elements.has(el); },
+            'release': function() {}};
+    } else {
+        var mark = '__vision_' + identitySets.length + '_' + new Date().getTime();
+        var marked = [];
+        set = {
+            'add': function(el) {
+                if (el[mark] !== true) {
+                    el[mark] = true;
+                    marked.push(el);
+                }
+            },
+            'has': function(el) { return el[mark] === true; },
+            'release': function() {
+                for (var i = 0; i < marked.length; i++) {
+                    try {
+                        delete marked[i][mark];
+                    } catch (e) {
+                        // Old IE can't delete properties of elements
+                        marked[i][mark] = undefined;
+                    }
+                }
+                marked = [];
+            }};
+    }
+    identitySets.push(set);
+    return set;
+}
 
+function releaseIdentitySets() {
+    for (var i = 0; i < identitySets.length; i++) {
+        identitySets[i].release();
+    }
+    identitySets = [];
+}
+"""
+
+# Returns the elements in arguments[0] that aren't in arguments[1], each
+# only once, in order.
+dedupe_js = identity_set_js + """
+var matches = arguments[0];
+var dont_want = arguments[1];
+var seen = identitySet();
+var unwanted = identitySet();
+try {
+    for (var i = 0; i < dont_want.length; i++) {
+        unwanted.add(dont_want[i]);
+    }
+    var unique = [];
+    for (var i = 0; i < matches.length; i++) {
+        if (!seen.has(matches[i]) && !unwanted.has(matches[i])) {
+            seen.add(matches[i]);
+            unique.push(matches[i]);
+        }
+    }
+    return unique;
+} finally {
+    releaseIdentitySets();
+}
+"""
+
+def locator_func(noun, func, finds, nots, filters=None, ordinal=None, replace_id=True, trusteds=()):
     # Make sure there's a place to store timing information for this
     # noun
     noun.command.timing[noun] = noun.command.timing.get(
@@ -490,19 +753,6 @@ def locator_func(noun, func, finds, nots, filters=None, ordinal=None, replace_id
             'times_found': 0
         })
     try:
-        js_func = (
-            "var seen = [];\n"
-            "var matches = arguments[0];\n"
-            "var dont_want = arguments[1];\n"
-            "return matches.filter(function(el){\n"
-            "    if(seen.filter(function(x){return x === el;}).length != 0 || dont_want.filter(function(x){return x === el;}).length != 0) {\n"
-            "        return false;\n"
-            "    } else {\n"
-            "        seen.push(el);\n"
-            "        return true;\n"
-            "    }\n"
-            "});\n")
-
         filters = filters or [lambda el, noun: True]
         trusted = []
         possibles = []
@@ -538,12 +788,13 @@ def locator_func(noun, func, finds, nots, filters=None, ordinal=None, replace_id
                     for possible in new_possibles:
                         possible.locator = xpath
                         found_elements[possible] = xpath
-                        yield possible
+                    yield new_possibles
 
             correct_start = time.time()
-            elements = trusted_generator()
-            for filt in filters:
-                elements = itertools.ifilter(functools.partial(filter_timing, filt=filt, noun=noun), elements)
+            # Each trusted xpath is only searched if what the ones before
+            # it found doesn't meet the filters
+            elements = itertools.chain.from_iterable(
+                apply_filters(new_possibles, filters, noun) for new_possibles in trusted_generator())
 
             ele = None
             try:
@@ -552,6 +803,7 @@ def locator_func(noun, func, finds, nots, filters=None, ordinal=None, replace_id
                 while True:
                     try:
                         el = next(elements)
+                        el.locator = found_elements[el]
 
                         if not getattr(noun, 'id', None):
                             noun.id = None
@@ -639,9 +891,10 @@ def locator_func(noun, func, finds, nots, filters=None, ordinal=None, replace_id
         # 4) run the result of 3 through any filters provided, in order.
         #    This is done lazily, because the filters might be expensive,
         #    performance-wise
-        elements = (el for el in noun.parser.interpreter.webdriver.execute_script(js_func, possibles, filter_elements))
-        for filt in filters:
-            elements = itertools.ifilter(functools.partial(filter_timing, filt=filt, noun=noun), elements)
+        elements = apply_filters(
+            noun.parser.interpreter.webdriver.execute_script(dedupe_js, possibles, filter_elements),
+            filters,
+            noun)
 
         i = 0
         el = None
@@ -715,9 +968,10 @@ def locator_func(noun, func, finds, nots, filters=None, ordinal=None, replace_id
             # 4) run the result of 3 through any filters provided, in order.
             #    This is done lazily, because the filters might be expensive,
             #    performance-wise
-            elements = (el for el in noun.parser.interpreter.webdriver.execute_script(js_func, possibles, filter_elements))
-            for filt in filters:
-                elements = itertools.ifilter(functools.partial(filter_timing, filt=filt, noun=noun), elements)
+            elements = apply_filters(
+                noun.parser.interpreter.webdriver.execute_script(dedupe_js, possibles, filter_elements),
+                filters,
+                noun)
 
             i = 0
             el = None
@@ -761,134 +1015,849 @@ def locator_func(noun, func, finds, nots, filters=None, ordinal=None, replace_id
         noun.element = el
         return el
     finally:
-        command_timing = noun.parser.children[-1].timing
-        noun_timing = command_timing.get(noun, {})
-        if getattr(noun, 'element', None):
-            noun_timing['times_found'] = noun_timing.get('times_found', 0) + 1
-            noun_timing['locator'] = noun.element.locator
-            noun_timing['correct_element'] = sum(info['total'] for locator, info in locator_info.items() if locator == noun.element.locator)
-            noun_timing['other_elements_total'] = sum(info['total'] for locator, info in locator_info.items() if locator != noun.element.locator)
+        record_locator_timing(noun, locator_info)
+
+def record_locator_timing(noun, locator_info):
+    command_timing = noun.parser.children[-1].timing
+    noun_timing = command_timing.get(noun, {})
+    if getattr(noun, 'element', None):
+        noun_timing['times_found'] = noun_timing.get('times_found', 0) + 1
+        noun_timing['locator'] = noun.element.locator
+        noun_timing['correct_element'] = sum(info['total'] for locator, info in locator_info.items() if locator == noun.element.locator)
+        noun_timing['other_elements_total'] = sum(info['total'] for locator, info in locator_info.items() if locator != noun.element.locator)
+    else:
+        noun_timing['times_found'] = 0
+        noun_timing['locator'] = None
+        noun_timing['other_elements_total'] = sum(info['total'] for locator, info in locator_info.items())
+    command_timing[noun] = noun_timing
+
+# Defines now(), the time in milliseconds, as precisely as the browser
+# can tell
+timer_js = """
+var now = (window.performance && window.performance.now) ?
+    function() { return window.performance.now(); } :
+    function() { return new Date().getTime(); };
+"""
+
+# Defines isDisplayed(el), which is close to what WebDriver's
+# is_displayed does, but doesn't need a call to the browser for each
+# element.
+is_displayed_js = """
+function isDisplayed(el) {
+    var tag = el.tagName.toLowerCase();
+    if (tag == 'option' || tag == 'optgroup') {
+        var select = el.parentNode;
+        while (select && !(select.tagName && select.tagName.toLowerCase() == 'select')) {
+            select = select.parentNode;
+        }
+        return !select || isDisplayed(select);
+    }
+    if (tag == 'input' && (el.getAttribute('type') || '').toLowerCase() == 'hidden') {
+        return false;
+    }
+    if (!el.getClientRects().length) {
+        // It, or something it's in, isn't rendered
+        return false;
+    }
+    var style = window.getComputedStyle(el);
+    if (style.visibility == 'hidden' || style.visibility == 'collapse') {
+        return false;
+    }
+    for (var node = el; node && node.nodeType == 1; node = node.parentNode) {
+        if (window.getComputedStyle(node).opacity == '0') {
+            return false;
+        }
+    }
+    return true;
+}
+"""
+
+# Defines centerElement(el, parent, allAncestors, horizontal, vertical),
+# which scrolls el to the middle of parent, or of every ancestor with
+# scrollbars if allAncestors is set, and then of the window unless there's
+# a parent, and returns its bounding client rect once it's centered.
+center_js = """
+function centerElement(el, parent, allAncestors, horizontal, vertical) {
+    function scrolls(overflow) {
+        return overflow !== 'visible' && overflow !== 'hidden' && overflow !== 'clip';
+    }
+
+    function middle(node) {
+        var rect = node.getBoundingClientRect();
+        return [(rect.left + rect.right) / 2, (rect.top + rect.bottom) / 2];
+    }
+
+    var scrollers = [];
+    if (parent) {
+        scrollers.push(parent);
+    } else if (allAncestors) {
+        // Every ancestor that has scrollbars, innermost first
+        var node = el.parentNode;
+        while (node && node.nodeType === 1 && node.tagName.toLowerCase() !== 'body' && node.tagName.toLowerCase() !== 'html') {
+            var style = window.getComputedStyle(node);
+            if ((scrolls(style.getPropertyValue('overflow-x')) && node.scrollWidth > node.clientWidth) ||
+                (scrolls(style.getPropertyValue('overflow-y')) && node.scrollHeight > node.clientHeight)) {
+                scrollers.push(node);
+            }
+            node = node.parentNode;
+        }
+    }
+
+    // Scroll each so the middle of el is in the middle of what it
+    // shows; the browser keeps the scrolling in bounds.  Scrolling
+    // one moves everything in it the same, so el stays where the
+    // ones inside it put it.
+    for (var i = 0; i < scrollers.length; i++) {
+        var scroller = scrollers[i];
+        var box = scroller.getBoundingClientRect();
+        var center = middle(el);
+        if (horizontal) {
+            scroller.scrollLeft += center[0] - (box.left + scroller.clientLeft + scroller.clientWidth / 2);
+        }
+        if (vertical) {
+            scroller.scrollTop += center[1] - (box.top + scroller.clientTop + scroller.clientHeight / 2);
+        }
+    }
+    if (!parent) {
+        var center = middle(el);
+        window.scrollTo(
+            horizontal ? Math.max(0, window.pageXOffset + center[0] - window.innerWidth / 2) : window.pageXOffset,
+            vertical ? Math.max(0, window.pageYOffset + center[1] - window.innerHeight / 2) : window.pageYOffset);
+    }
+
+    var rect = el.getBoundingClientRect();
+    return {
+        'left': rect.left,
+        'top': rect.top,
+        'right': rect.right,
+        'bottom': rect.bottom,
+        'width': rect.width,
+        'height': rect.height};
+}
+"""
+
+# Defines attributeOrText(el, attribute), which is close to what
+# WebElement.get_attribute(attribute) or WebElement.text is
+attribute_or_text_js = """
+function attributeOrText(el, attribute) {
+    var value = el[attribute];
+    if (value === undefined || value === null || typeof value == 'object' || typeof value == 'function') {
+        value = el.getAttribute(attribute);
+    }
+    if (value === undefined || value === null || value === '') {
+        value = (el.innerText || el.textContent || '').replace(/^\\s+|\\s+$/g, '');
+    }
+    return String(value);
+}
+"""
+
+# Defines what the scripts that find nouns in the browser share:
+# search(xpath), which finds the elements xpath does in context,
+# displayed(el), and result(trusted, elements), which returns what was
+# found with how long searching and checking what's displayed took.
+# context has to be defined first.
+browser_search_js = timer_js + is_displayed_js + """
+var searches = [];
+var displayedTime = 0;
+
+function search(xpath) {
+    var start = now();
+    var result = document.evaluate(
+        xpath, context, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    var nodes = [];
+    for (var i = 0; i < result.snapshotLength; i++) {
+        var node = result.snapshotItem(i);
+        if (node.nodeType == 1) {
+            nodes.push(node);
+        }
+    }
+    searches.push([xpath, nodes.length, (now() - start) / 1000]);
+    return nodes;
+}
+
+function displayed(el) {
+    var start = now();
+    try {
+        return isDisplayed(el);
+    } finally {
+        displayedTime += now() - start;
+    }
+}
+
+function result(trusted, elements) {
+    return {
+        'trusted': trusted,
+        'elements': elements,
+        'searches': searches,
+        'displayed': displayedTime / 1000};
+}
+"""
+
+# Searches for the element a noun is in the browser, see
+# browser_locator_func.  The arguments are the context element (or null
+# for the document), the trusted xpaths, the xpaths to find, the xpaths
+# not to find and the ordinal of the element wanted.  When the ordinal is
+# 0, every displayed element found is returned, so that they can be
+# filtered.
+browser_locator_js = identity_set_js + """
+var context = arguments[0] || document;
+var trusteds = arguments[1];
+var finds = arguments[2];
+var nots = arguments[3];
+var ordinal = arguments[4];
+""" + browser_search_js + """
+function locate() {
+    var searched = {};
+    var trusted = [];
+    var seen = identitySet();
+    for (var t = 0; t < trusteds.length; t++) {
+        if (searched.hasOwnProperty(trusteds[t])) {
+            continue;
+        }
+        searched[trusteds[t]] = true;
+        var nodes = search(trusteds[t]);
+        for (var n = 0; n < nodes.length; n++) {
+            if (seen.has(nodes[n])) {
+                continue;
+            }
+            seen.add(nodes[n]);
+            if (displayed(nodes[n])) {
+                trusted.push([nodes[n], trusteds[t]]);
+                if (ordinal) {
+                    return result(trusted, []);
+                }
+            }
+        }
+    }
+
+    var unwanted = identitySet();
+    for (var t = 0; t < nots.length; t++) {
+        var nodes = search(nots[t]);
+        for (var n = 0; n < nodes.length; n++) {
+            unwanted.add(nodes[n]);
+        }
+    }
+
+    var elements = [];
+    seen = identitySet();
+    for (var t = 0; t < finds.length; t++) {
+        if (searched.hasOwnProperty(finds[t])) {
+            // The trusted elements weren't wanted
+            continue;
+        }
+        searched[finds[t]] = true;
+        var nodes = search(finds[t]);
+        for (var n = 0; n < nodes.length; n++) {
+            var node = nodes[n];
+            if (seen.has(node) || unwanted.has(node)) {
+                continue;
+            }
+            seen.add(node);
+            if (!displayed(node)) {
+                continue;
+            }
+            elements.push([node, finds[t]]);
+            if (ordinal && elements.length == ordinal) {
+                return result([], [elements[ordinal - 1]]);
+            }
+        }
+    }
+    return result(trusted, ordinal ? [] : elements);
+}
+
+try {
+    return locate();
+} finally {
+    releaseIdentitySets();
+}
+"""
+
+def locate_in_browser(noun, func, script, arguments, filters, ordinal, replace_id):
+    """
+    Finds the element for noun with script, which is called with the
+    element to search in (or None for the document), arguments, and the
+    ordinal of the element wanted, or 0 if there are filters, which are
+    run from here on what the browser found.  The script returns what
+    result() in browser_search_js does.
+    """
+    noun.command.timing[noun] = noun.command.timing.get(
+        noun, {
+            'total': 0,
+            'times_found': 0
+        })
+    ordinal = ordinal or noun.ordinal
+    context = getattr(func, 'im_self', None)
+    if not isinstance(context, WebElement):
+        context = None
+
+    locator_info = {}
+    try:
+        locating_start = time.time()
+        if noun.command.verbose:
+            print "VERBOSE: XPATH: START: Searching the browser for '%s'" % noun.code
+        found = noun.parser.interpreter.webdriver.execute_script(
+            script,
+            *([context] + list(arguments) + [0 if filters else ordinal]))
+        for xpath, count, total in found['searches']:
+            if noun.command.verbose:
+                if count:
+                    print "VERBOSE: XPATH: SUCCESS: (%f seconds) Found %d possible elements with %s" % (total, count, xpath)
+                else:
+                    print "VERBOSE: XPATH: FAILURE: (%f seconds) Unable to find possible elements with %s" % (total, xpath)
+            locator_info[xpath] = {
+                'locator': "xpath=%s" % xpath,
+                'elements': count,
+                'total': total}
+        noun.command.timing[noun][_displayed_filter.__name__] = found['displayed']
+
+        el = None
+        # The first trusted element that meets the filters will do,
+        # otherwise the ordinal one of the others that do.
+        for candidates, wanted in ((found['trusted'], 1), (found['elements'], ordinal if filters else 1)):
+            locators = dict(candidates)
+            elements = apply_filters([element for element, xpath in candidates], filters, noun)
+            i = 0
+            while i < wanted:
+                try:
+                    el = next(elements)
+                    i += 1
+                except StaleElementReferenceException, sere:
+                    # If the element is stale, continue on
+                    pass
+                except StopIteration, si:
+                    el = None
+                    break
+            if el:
+                el.locator = locators[el]
+                break
         else:
-            noun_timing['times_found'] = 0
-            noun_timing['locator'] = None
-            noun_timing['other_elements_total'] = sum(info['total'] for locator, info in locator_info.items())
-        command_timing[noun] = noun_timing
+            return None
+
+        if noun.command.verbose:
+            print "VERBOSE: NOUN: SUCCESS: (%f seconds) Found '%s' using '%s'" % (time.time() - locating_start, noun.code, el.locator)
+
+        if not getattr(noun, 'id', None):
+            noun.id = None
+            if replace_id:
+                try:
+                    noun.id = el.get_attribute('id')
+                except WebDriverException, wde:
+                    pass
+        noun.element = el
+        return el
+    finally:
+        record_locator_timing(noun, locator_info)
 
-def interpret_noun(self, interpreter, context_element=None, requesting_command=None, locator_func=locator_func):
+def browser_locator_func(noun, func, finds, nots, filters=None, ordinal=None, replace_id=True, trusteds=()):
+    """
+    Finds the element for noun like locator_func does, but in one call
+    to the browser, which searches the xpaths, leaves out what the nots
+    find and what isn't displayed.  Only the filters other than
+    _displayed_filter are run from here, on what the browser found; if
+    there aren't any, the browser picks the element too.
+
+    func is only used to know the element to search in, so this can only
+    be used with find_elements_by_xpath.
+    """
+    return locate_in_browser(
+        noun,
+        func,
+        browser_locator_js,
+        (
+            # Trusted elements are only looked for without an ordinal
+            [] if noun.has_ordinal() else list(trusteds),
+            list(finds),
+            list(nots)),
+        [filt for filt in (filters or []) if filt is not _displayed_filter],
+        ordinal,
+        replace_id)
+
+# Finds the rows with a value in the browser, see row_locator_func.  The
+# arguments are the context element (or null for the document), the
+# xpath for every row, the xpaths for rows with roles, the xpaths not to
+# find, the value and the ordinal of the row wanted, or 0 for every row
+# that has the value.
+row_locator_js = identity_set_js + """
+var context = arguments[0] || document;
+var rowsXPath = arguments[1];
+var roles = arguments[2];
+var nots = arguments[3];
+var value = arguments[4];
+var ordinal = arguments[5];
+""" + browser_search_js + """
+function trim(text) {
+    return text.replace(/^\\s+|\\s+$/g, '');
+}
+
+function startsWithValue(text) {
+    return text.indexOf(value) == 0;
+}
+
+// Whether a displayed cell in row starts with the value
+function hasText(row) {
+    var cells = row.getElementsByTagName('td');
+    for (var i = 0; i < cells.length; i++) {
+        var text = trim((cells[i].textContent || '').replace(/\\s+/g, ' '));
+        if (startsWithValue(text) && displayed(cells[i])) {
+            return true;
+        }
+    }
+    return false;
+}
+
+// Whether a displayed widget in a cell in row has a value, placeholder
+// or selected option that starts with the value
+function hasWidget(row) {
+    var widgets = row.querySelectorAll('td input, td textarea, td button, td select');
+    for (var i = 0; i < widgets.length; i++) {
+        var widget = widgets[i];
+        var tag = widget.tagName.toLowerCase();
+        var text;
+        if (tag == 'select') {
+            if (widget.selectedIndex < 0) {
+                continue;
+            }
+            text = widget.options[widget.selectedIndex].text;
+        } else if (tag == 'button') {
+            text = widget.value || '';
+        } else {
+            if (tag == 'input' && (widget.getAttribute('type') || '').toLowerCase() == 'hidden') {
+                continue;
+            }
+            text = widget.value || widget.getAttribute('placeholder') || '';
+        }
+        if (startsWithValue(trim(text)) && displayed(widget)) {
+            return true;
+        }
+    }
+    return false;
+}
+
+// Whether a row in row matches too, in which case that row is the one
+// wanted, not this one
+function hasMatchingRow(row, matches) {
+    var rows = row.getElementsByTagName('tr');
+    for (var i = 0; i < rows.length; i++) {
+        if (matches(rows[i])) {
+            return true;
+        }
+    }
+    return false;
+}
+
+function hasTextOrWidget(row) {
+    return hasText(row) || hasWidget(row);
+}
+
+function locate() {
+    var unwanted = identitySet();
+    for (var t = 0; t < nots.length; t++) {
+        var nodes = search(nots[t]);
+        for (var n = 0; n < nodes.length; n++) {
+            unwanted.add(nodes[n]);
+        }
+    }
+
+    var rows = search(rowsXPath);
+    var elements = [];
+    var seen = identitySet();
+    function add(row, xpath) {
+        if (seen.has(row) || unwanted.has(row)) {
+            return false;
+        }
+        seen.add(row);
+        if (!displayed(row)) {
+            return false;
+        }
+        elements.push([row, xpath]);
+        return ordinal && elements.length == ordinal;
+    }
+
+    // Rows with the text come first, then rows with roles, then rows
+    // with widgets with the value
+    for (var r = 0; r < rows.length; r++) {
+        if (hasText(rows[r]) && !hasMatchingRow(rows[r], hasText) && add(rows[r], rowsXPath)) {
+            return result([], [elements[ordinal - 1]]);
+        }
+    }
+    for (var t = 0; t < roles.length; t++) {
+        var nodes = search(roles[t]);
+        for (var n = 0; n < nodes.length; n++) {
+            if (add(nodes[n], roles[t])) {
+                return result([], [elements[ordinal - 1]]);
+            }
+        }
+    }
+    for (var r = 0; r < rows.length; r++) {
+        if (!seen.has(rows[r]) && hasWidget(rows[r]) && !hasMatchingRow(rows[r], hasTextOrWidget) && add(rows[r], rowsXPath)) {
+            return result([], [elements[ordinal - 1]]);
+        }
+    }
+    return result([], ordinal ? [] : elements);
+}
+
+try {
+    return locate();
+} finally {
+    releaseIdentitySets();
+}
+"""
+
+def row_locator_func(noun, func, finds, nots, filters=None, ordinal=None, replace_id=True, trusteds=()):
+    """
+    Finds the row for a row noun with a value in one call to the
+    browser, rather than checking the cells and widgets of each row
+    with _widget_value_filter.  finds is what compile_row_to_xpath
+    compiles to for the browser locator: the xpath for every row, then
+    those for rows with roles.
+    """
+    return locate_in_browser(
+        noun,
+        func,
+        row_locator_js,
+        (finds[0], list(finds[1:]), list(nots), str(noun.value)),
+        [filt for filt in (filters or []) if filt not in (_displayed_filter, _widget_value_filter)],
+        ordinal,
+        replace_id)
+
+def interpret_noun(self, interpreter, context_element=None, requesting_command=None, locator_func=None):
     context_element = context_element or interpreter.webdriver
     requesting_command = requesting_command or self.command
     xpath = None
     if getattr(self, 'id', None):
         requesting_command.timing[self]['locator'] = 'id=%s' % self.id
         locator = functools.partial(
-            locator_func,
+            # Only the webdriver locator finds elements by id
+            locator_func or interpreter.locators['webdriver'],
             filters=[_displayed_filter] + self.filters + (self.command.verb.filters if self is next(self.command.subject.window_context_nouns) else []),
             noun=self,
             func=context_element.find_elements_by_id,
             finds=[self.id],
             nots=())
     else:
-        trusted, xpaths, nots = self.compile()
+        trusted, xpaths, nots = compile_noun_plan(self)
         requesting_command.timing[self]['locator'] = 'xpath=%s' % xpath
         locator = functools.partial(
-            locator_func,
+            locator_func or interpreter.locators[interpreter.locator],
             filters=[_displayed_filter] + self.filters  + (self.command.verb.filters if self is next(self.command.subject.window_context_nouns) else []),
             noun=self,
             func=context_element.find_elements_by_xpath,
             finds=xpaths,
             nots=nots,
             trusteds=trusted)
+    memo_key = None
+    if interpreter.generation is not None:
+        memo_key = locator_memo_key(self, context_element, locator.keywords['filters'], locator.func)
     try:
-        el = locator()
-        if el:
+        el = None
+        if memo_key in interpreter.located:
+            el = remembered_element(self, interpreter, memo_key, requesting_command)
+        if memo_key not in interpreter.located:
             try:
-                hovering_start = time.time()
-                if self.command.verbose:
-                    print "VERBOSE: HOVER: START: Hovering over the element '%s'" % self.code
-                selenium.webdriver.common.action_chains.ActionChains(interpreter.webdriver).move_to_element_with_offset(el, -1, -1).move_to_element(el).perform()
-                hovering_end = time.time()
-                if self.command.verbose:
-                    print "VERBOSE: HOVER: SUCCESS: (%f seconds) Hovered over the element '%s'" % (hovering_end - hovering_start, self.code)
-            except:
-                if self.command.verbose:
-                    print "VERBOSE: HOVER: FAILURE: (%f seconds) Failed to hover over the element '%s'" % (hovering_end - hovering_start, self.code)
-                pass
-        else:
+                el = locator()
+            except StopIteration, si:
+                if memo_key:
+                    interpreter.located[memo_key] = None
+                raise
+            if memo_key:
+                interpreter.located[memo_key] = el
+        if not el:
             raise visionexceptions.UnfoundElementError(self)
+        hover_noun(self, interpreter, el, requesting_command)
         return el
     except StopIteration, si:
         # We didn't find enough things; pass
         pass
 
-def interpret_cell(self, interpreter, context_element, *args, **kwargs):
-    header_possibilities = (
-        context_element.find_elements_by_xpath(
-            './ancestor::table/descendant::th[starts-with(normalize-space(.),%s) and not(starts-with(normalize-space(descendant::th),%s))]' % ((self.value.compile(),) * 2)) +
-        context_element.find_elements_by_xpath(
-            './ancestor::table/descendant::th[starts-with(normalize-space(.), %s) and not(starts-with(normalize-space(descendant::th), %s))]' % ((self.value.compile(),) * 2)))
-    if not header_possibilities:
-        raise visionexceptions.UnfoundElementError(self)
+def locator_memo_key(noun, context_element, filters, func):
+    """
+    Returns what a noun's locator result is memoized by while its
+    command is retried in the same DOM generation: what the noun is and says, what it's looked for in,
+    and how it's looked for.  Returns None if it can't be memoized.
+    """
+    key = subject_key([noun])
+    if not key:
+        return None
+    return (
+        key[0],
+        getattr(noun, 'id', None),
+        context_element.id if isinstance(context_element, WebElement) else None,
+        tuple(_filter_name(filt) for filt in filters),
+        func)
+
+def remembered_element(noun, interpreter, memo_key, requesting_command):
+    """
+    Returns the element the noun was found as earlier in this DOM
+    generation, or None if it wasn't found, without searching again.
+    An element that isn't displayed anymore, which CSS can do without
+    changing the DOM, is forgotten so that the noun is searched for.
+    The filters that do something to the element, like the verb's, are
+    still run.
+    """
+    el = interpreter.located[memo_key]
+    if el is not None:
+        try:
+            displayed = _displayed_filter(el, noun)
+        except WebDriverException, wde:
+            # It went stale
+            displayed = False
+        if not displayed:
+            del interpreter.located[memo_key]
+            return None
+    requesting_command.timing[noun]['memoized'] = True
+    if noun.command.verbose:
+        print "VERBOSE: NOUN: MEMOIZED: The page hasn't changed since '%s' was %s" % (
+            noun.code,
+            "found" if el else "looked for")
+    if el is None:
+        return None
+    if noun is next(noun.command.subject.window_context_nouns):
+        el = next(apply_filters([el], noun.command.verb.filters, noun), None)
+    if el:
+        noun.element = el
+    return el
 
-    header = None
-    for (i, th) in enumerate(header_possibilities, 1):
-        if i == self.ordinal:
-            header = th
-            break
-    else:
-        raise visionexceptions.VisionException("Cannot find the header cell!")
+def hover_noun(noun, interpreter, el, requesting_command):
+    """
+    Moves the mouse over el, the element found for noun, if the hover
+    policy says to
+    """
+    if not interpreter.should_hover(noun, requesting_command):
+        interpreter.record_hover(None)
+        return
+    hovering_start = time.time()
+    try:
+        if noun.command.verbose:
+            print "VERBOSE: HOVER: START: Hovering over the element '%s'" % noun.code
+        selenium.webdriver.common.action_chains.ActionChains(interpreter.webdriver).move_to_element_with_offset(el, -1, -1).move_to_element(el).perform()
+        hovering_end = time.time()
+        if noun.command.verbose:
+            print "VERBOSE: HOVER: SUCCESS: (%f seconds) Hovered over the element '%s'" % (hovering_end - hovering_start, noun.code)
+    except:
+        hovering_end = time.time()
+        if noun.command.verbose:
+            print "VERBOSE: HOVER: FAILURE: (%f seconds) Failed to hover over the element '%s'" % (hovering_end - hovering_start, noun.code)
+        pass
+    # Hovering can show or hide things, like menus, without changing the
+    # DOM generation
+    interpreter.located.clear()
+    requesting_command.timing[noun]['hover'] = hovering_end - hovering_start
+    interpreter.record_hover(hovering_end - hovering_start)
+
+def interpret_row(self, interpreter, context_element=None, requesting_command=None, locator_func=None):
+    if not locator_func and self.value and not getattr(self, 'id', None) and interpreter.locator == 'browser':
+        locator_func = row_locator_func
+    return interpret_noun(
+        self,
+        interpreter,
+        context_element,
+        requesting_command,
+        locator_func)
 
-    if not header:
-        raise visionexceptions.UnfoundElementError(self)
+# Finds a cell in the browser, see interpret_cell.  The arguments are the
+# row, what the header starts with and the ordinal of the header and the
+# cell.  What each table's headers are, and which columns they're in, is
+# kept on the table, with the headers that have been looked up, so the
+# rest of its rows only have to check that its headers haven't changed.
+# Returns a reason and the cell.
+cell_locator_js = is_displayed_js + center_js + """
+var row = arguments[0];
+var value = arguments[1];
+var ordinal = arguments[2];
+
+function text(node) {
+    return (node.textContent || '').replace(/[ \\t\\r\\n]+/g, ' ').replace(/^ | $/g, '');
+}
+
+function tag(node) {
+    return node.nodeType == 1 ? node.tagName.toLowerCase() : '';
+}
+
+function closestTable(node) {
+    for (node = node.parentNode; node && node.nodeType == 1; node = node.parentNode) {
+        if (tag(node) == 'table') {
+            return node;
+        }
+    }
+    return null;
+}
+
+// The first column a cell is in
+function columnOf(cell) {
+    var column = 0;
+    for (var sibling = cell.previousSibling; sibling; sibling = sibling.previousSibling) {
+        if (tag(sibling) == 'td' || tag(sibling) == 'th') {
+            column += sibling.colSpan || 1;
+        }
+    }
+    return column;
+}
+
+// Whether a cell in a row above spans down into the row.  Cells only
+// span the rows of their own thead, tbody or tfoot.
+function spannedInto(row) {
+    var above = 0;
+    for (var sibling = row.previousSibling; sibling; sibling = sibling.previousSibling) {
+        if (tag(sibling) != 'tr') {
+            continue;
+        }
+        above++;
+        for (var cell = sibling.firstChild; cell; cell = cell.nextSibling) {
+            if ((tag(cell) == 'td' || tag(cell) == 'th') && (cell.rowSpan === 0 || cell.rowSpan > above)) {
+                return true;
+            }
+        }
+    }
+    return false;
+}
+
+// The headers are every th in the tables the row is in, the way
+// ./ancestor::table/descendant::th finds them, so they're all in the
+// outermost one.
+var table = null;
+for (var node = closestTable(row); node; node = closestTable(node)) {
+    table = node;
+}
+if (!table) {
+    return ['no header', null];
+}
+
+// What each header says, and the columns it covers, which change if the
+// cells before it in its row do
+var ths = table.getElementsByTagName('th');
+var texts = [];
+var spans = [];
+for (var i = 0; i < ths.length; i++) {
+    texts.push(text(ths[i]));
+    spans.push(columnOf(ths[i]) + '+' + (ths[i].colSpan || 1));
+}
+var columns = table.__visionColumns;
+var changed = !columns || columns.ths.length != ths.length;
+for (var i = 0; !changed && i < ths.length; i++) {
+    changed = columns.ths[i] !== ths[i] || columns.texts[i] !== texts[i] || columns.spans[i] !== spans[i];
+}
+if (changed) {
+    columns = table.__visionColumns = {
+        'ths': Array.prototype.slice.call(ths),
+        'texts': texts,
+        'spans': spans,
+        'headers': {}};
+}
+
+var key = ordinal + ':' + value;
+var header = columns.headers[key];
+if (!header) {
+    var matches = [];
+    for (var i = 0; i < ths.length; i++) {
+        if (texts[i].indexOf(value) == 0) {
+            // Leave out headers with headers in them that match too
+            var inner = ths[i].getElementsByTagName('th');
+            if (!(inner.length && text(inner[0]).indexOf(value) == 0)) {
+                matches.push(ths[i]);
+            }
+        }
+    }
+    if (!matches.length) {
+        header = {'reason': 'no header'};
+    } else if (matches.length < ordinal) {
+        header = {'reason': 'no ordinal header'};
+    } else {
+        var th = matches[ordinal - 1];
+        header = {
+            'reason': 'found',
+            'th': th,
+            'table': closestTable(th),
+            'column': (th.colSpan || 1) == 1 ? columnOf(th) : null};
+    }
+    columns.headers[key] = header;
+}
+if (header.reason != 'found') {
+    return [header.reason, null];
+}
+
+function middle(node) {
+    var rect = node.getBoundingClientRect();
+    return [(rect.left + rect.right) / 2, (rect.top + rect.bottom) / 2];
+}
+
+function holds(node, x, y) {
+    var rect = node.getBoundingClientRect();
+    return rect.left < x && x < rect.right && (y === null || (rect.top < y && y < rect.bottom));
+}
+
+// The row's own cell in the header's column.  Counting columns only
+// works if the header is in the row's table and nothing spans into
+// either of their rows, which can change with any row, so it's checked
+// every time; otherwise it's the cell under the middle of the header.
+var own = null;
+var x = null;
+if (header.column !== null && header.table === closestTable(row) &&
+    !spannedInto(row) && !spannedInto(header.th.parentNode)) {
+    var column = 0;
+    for (var cell = row.firstChild; cell && column <= header.column; cell = cell.nextSibling) {
+        if (tag(cell) == 'td' || tag(cell) == 'th') {
+            if (header.column < column + (cell.colSpan || 1)) {
+                own = tag(cell) == 'td' ? cell : null;
+                break;
+            }
+            column += cell.colSpan || 1;
+        }
+    }
+} else {
+    x = middle(header.th)[0];
+    for (var cell = row.firstChild; cell; cell = cell.nextSibling) {
+        if (tag(cell) == 'td' && holds(cell, x, null)) {
+            own = cell;
+            break;
+        }
+    }
+}
+if (!own) {
+    return ['no cell', null];
+}
+
+// Past the first, cells are the ones in it under the middle of the
+// header, outermost first
+var cells = [own];
+if (ordinal > 1) {
+    if (x === null) {
+        x = middle(header.th)[0];
+    }
+    var y = middle(row)[1];
+    var inner = own.getElementsByTagName('td');
+    for (var i = 0; i < inner.length; i++) {
+        if (holds(inner[i], x, y)) {
+            cells.push(inner[i]);
+        }
+    }
+}
+var found = 0;
+for (var i = 0; i < cells.length; i++) {
+    if (isDisplayed(cells[i]) && ++found == ordinal) {
+        centerElement(cells[i], null, true, true, true);
+        return ['found', cells[i]];
+    }
+}
+return ['no cell', null];
+"""
 
-    interpreter.center_element(header)
-    column_bound = self.parser.interpreter.webdriver.execute_script(
-        "return arguments[0].getBoundingClientRect();",
-        header)
-
-    # We don't want to center the row horizontally
-    interpreter.center_element(context_element, horizontal=False)
-
-    cell_iter = None
-    if self.parser.interpreter.webdriver.execute_script("return document.elementsFromPoint;"):
-        row_bound = self.parser.interpreter.webdriver.execute_script(
-            "return arguments[0].getBoundingClientRect();",
-            context_element)
-        elements_in_cell = self.parser.interpreter.webdriver.execute_script(
-            "return document.elementsFromPoint(arguments[0], arguments[1]);",
-            (column_bound['left'] + column_bound['right'])/2,
-            (row_bound['top'] + row_bound['bottom'])/2)
-        if not elements_in_cell:
-            raise visionexceptions.UnfoundElementError(self)
+def interpret_cell(self, interpreter, context_element, *args, **kwargs):
+    if self.value is None:
+        raise visionexceptions.UnfoundElementError(self)
 
-        cell_iter = iter(reversed(filter(
-            lambda x: x.tag_name.lower() == 'td',
-            itertools.takewhile(
-                lambda x, row=context_element:x != row,
-                elements_in_cell))))
-    else:
-        cell_iter = (td for td in
-            context_element.find_elements_by_xpath('./td') if
-            self.parser.interpreter.webdriver.execute_script("""
-                var bounding = arguments[0].getBoundingClientRect();
-                return bounding['left'] < arguments[1] && arguments[1] < bounding['right'];""",
-                td, (column_bound['left'] + column_bound['right']) / 2))
-
-    i = 0
-    cell = None
-    while i < self.ordinal:
-        try:
-            cl = next(cell_iter)
-            if cl.is_displayed():
-                i += 1
-                cell = cl
-        except StopIteration as si:
-            break
-    if not cell:
+    reason, cell = interpreter.webdriver.execute_script(
+        cell_locator_js,
+        context_element,
+        str(self.value),
+        self.ordinal)
+    if reason == 'no ordinal header':
+        raise visionexceptions.VisionException("Cannot find the header cell!")
+    elif not cell:
         raise visionexceptions.UnfoundElementError(self)
 
     return cell
 
-def interpret_attribute_noun(self, interpreter, context_element=None, requesting_command=None, locator_func=locator_func):
+def interpret_attribute_noun(self, interpreter, context_element=None, requesting_command=None, locator_func=None):
     el = interpret_noun(
         self,
         interpreter,
@@ -912,8 +1881,339 @@ def interpret_alert(self, interpreter, *args, **kwargs):
     except NoAlertPresentException, nape:
         return None
 
+# Starts counting changes to the page, if that hasn't been started, and
+# returns which page this is and how many times it's changed, as
+# "page:count", so comparing two tells whether the page changed in
+# between.  Loading images and finishing transitions count too, since
+# they can change what's displayed.  Returns null if the browser can't
+# watch for changes.
+dom_generation_js = """
+var generation = window.__visionGeneration;
+if (!generation) {
+    if (!window.MutationObserver) {
+        return null;
+    }
+    generation = window.__visionGeneration = {
+        'page': new Date().getTime() + '.' + Math.random().toString(36).slice(2),
+        'count': 0};
+    var changed = function() {
+        generation.count++;
+    };
+    new MutationObserver(changed).observe(document, {
+        'childList': true,
+        'attributes': true,
+        'characterData': true,
+        'subtree': true});
+    var events = ['load', 'transitionend', 'animationend', 'resize'];
+    for (var i = 0; i < events.length; i++) {
+        window.addEventListener(events[i], changed, true);
+    }
+}
+return generation.page + ':' + generation.count;
+"""
+
+class SubjectElementCache(object):
+    """
+    Keeps the elements that the subjects of recent commands were found
+    as, with the elements of the nouns they were found in, so that a
+    later command with an equivalent subject can use them again instead
+    of finding them again.  Only the size most recently used subjects
+    are kept.
+    """
+
+    def __init__(self, size=64):
+        self.size = size
+        self.subjects = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, key, window_handle):
+        """
+        Returns the elements kept for key, and the DOM generation they
+        were found in, if they were found in window_handle, or
+        (None, None)
+        """
+        try:
+            handle, elements, generation = self.subjects.pop(key)
+        except KeyError, ke:
+            self.misses += 1
+            return None, None
+        if handle != window_handle:
+            self.misses += 1
+            return None, None
+        self.subjects[key] = (handle, elements, generation)
+        return elements, generation
+
+    def put(self, key, window_handle, elements, generation=None):
+        self.subjects.pop(key, None)
+        self.subjects[key] = (window_handle, elements, generation)
+        if len(self.subjects) > self.size:
+            # Forget the least recently used subject
+            self.subjects.popitem(last=False)
+
+    def discard(self, key):
+        """
+        Forgets the elements kept for key, because they went stale
+        """
+        self.subjects.pop(key, None)
+        self.stale += 1
+
+    def clear(self):
+        self.subjects.clear()
+
+# Checks that every element in arguments[0] is still on the page, and
+# still the element its noun is found as.  arguments[1] has what each
+# element's noun is checked with, see noun_checks.  Each element is
+# searched for in the one after it, which its noun was found in, and the
+# last in the document.  The %s is replaced by the batch_js of the
+# nouns' filters, as in batch_filters_js.
+elements_valid_js = identity_set_js + is_displayed_js + attribute_or_text_js + """
+var predicates = [%s];
+var elements = arguments[0];
+var checks = arguments[1];
+
+function search(xpath, context) {
+    var result = document.evaluate(
+        xpath, context, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    var nodes = [];
+    for (var i = 0; i < result.snapshotLength; i++) {
+        if (result.snapshotItem(i).nodeType == 1) {
+            nodes.push(result.snapshotItem(i));
+        }
+    }
+    return nodes;
+}
+
+function meets(el, filters) {
+    if (!isDisplayed(el)) {
+        return false;
+    }
+    for (var f = 0; f < filters.length; f++) {
+        if (!predicates[filters[f][0]]([el], filters[f][1])[0]) {
+            return false;
+        }
+    }
+    return true;
+}
+
+// Returns the element a noun is found as in context, the way the
+// locators pick it: the first trusted element that's displayed and
+// meets the filters, or else the ordinal one of those the rest of the
+// xpaths find that the nots don't.
+function selected(check, context) {
+    var searched = {};
+    for (var t = 0; t < check.trusteds.length; t++) {
+        if (searched.hasOwnProperty(check.trusteds[t])) {
+            continue;
+        }
+        searched[check.trusteds[t]] = true;
+        var nodes = search(check.trusteds[t], context);
+        for (var n = 0; n < nodes.length; n++) {
+            if (meets(nodes[n], check.filters)) {
+                return nodes[n];
+            }
+        }
+    }
+
+    var unwanted = identitySet();
+    for (var t = 0; t < check.nots.length; t++) {
+        var nodes = search(check.nots[t], context);
+        for (var n = 0; n < nodes.length; n++) {
+            unwanted.add(nodes[n]);
+        }
+    }
+
+    var count = 0;
+    var seen = identitySet();
+    for (var t = 0; t < check.finds.length; t++) {
+        if (searched.hasOwnProperty(check.finds[t])) {
+            continue;
+        }
+        searched[check.finds[t]] = true;
+        var nodes = search(check.finds[t], context);
+        for (var n = 0; n < nodes.length; n++) {
+            if (seen.has(nodes[n]) || unwanted.has(nodes[n])) {
+                continue;
+            }
+            seen.add(nodes[n]);
+            if (meets(nodes[n], check.filters) && ++count == check.ordinal) {
+                return nodes[n];
+            }
+        }
+    }
+    return null;
+}
+
+function valid() {
+    for (var i = 0; i < elements.length; i++) {
+        var context = i + 1 < elements.length ? elements[i + 1] : document;
+        if (!document.documentElement.contains(elements[i]) ||
+            selected(checks[i], context) !== elements[i]) {
+            return false;
+        }
+    }
+    return true;
+}
+
+try {
+    return valid();
+} finally {
+    releaseIdentitySets();
+}
+"""
+
+# Checks that every element in arguments[0] is still on the page and
+# displayed, for when the page hasn't changed since they were found
+elements_displayed_js = is_displayed_js + """
+var elements = arguments[0];
+for (var i = 0; i < elements.length; i++) {
+    if (!document.documentElement.contains(elements[i]) || !isDisplayed(elements[i])) {
+        return false;
+    }
+}
+return true;
+"""
+
+def noun_checks(nouns):
+    """
+    Returns the batch_js of the nouns' filters, and for each noun the
+    trusted xpaths it's found with, the rest of them, the ones it
+    mustn't be found by, its filters, as the index of their batch_js and
+    their arguments, and its ordinal, for elements_valid_js
+    """
+    predicates = []
+    checks = []
+    for noun in nouns:
+        trusteds, xpaths, nots = compile_noun_plan(noun)
+        filters = []
+        for filt in noun.filters:
+            body = _batch_js(filt)
+            if not body:
+                continue
+            if body not in predicates:
+                predicates.append(body)
+            filters.append([
+                predicates.index(body),
+                getattr(filt, 'func', filt).batch_arguments(noun, **(getattr(filt, 'keywords', None) or {}))])
+        checks.append({
+            # Trusted elements are only looked for without an ordinal
+            'trusteds': [] if noun.has_ordinal() else list(trusteds),
+            'finds': list(xpaths),
+            'nots': list(nots),
+            'filters': filters,
+            'ordinal': noun.ordinal})
+    return predicates, checks
+
+def subject_key(nouns):
+    """
+    Returns what makes a subject made of nouns find the same elements as
+    another: what each noun is, what it says and where it's looked for.
+    Returns None if the elements can't be kept, because they aren't
+    elements on the page, or because whether they still match can't be
+    checked in the browser.
+    """
+    key = []
+    for noun in nouns:
+        if noun.type in ('alert', 'frame', 'window', 'cell'):
+            return None
+        if noun.value and not all(_batch_js(filt) for filt in noun.filters):
+            # Like rows, whose cells and widgets are checked one at a
+            # time
+            return None
+        key.append((
+            noun.type,
+            getattr(noun, 'method', None),
+            getattr(noun, 'means', None),
+            noun.value.identifier if noun.value else None,
+            noun.ordinal,
+            noun.axis,
+            tuple(getattr(noun, 'xpaths', ())),
+            tuple(str(child) for child in noun.children if isinstance(child, visionparser.RelativePosition))))
+    return tuple(key)
+
+def reuse_subject(self, interpreter, nouns, key):
+    """
+    Returns the element kept for an equivalent subject if it and the
+    elements it was found in are all still on the page, and still what
+    their nouns would be found as, which is checked with one script, and
+    the verb's filters still take it.  If the page hasn't changed since
+    they were found, they're only checked to still be displayed.  The
+    nouns are given the elements.  Returns None otherwise.
+    """
+    elements, generation = interpreter.subject_elements.get(key, self.command.window_handle)
+    if not elements:
+        return None
+    if any(noun.element is not None and noun.element != el for noun, el in zip(nouns, elements)):
+        # A noun it's in was found again since
+        interpreter.subject_elements.discard(key)
+        return None
+
+    start = time.time()
+    subject_noun = nouns[0]
+    self.command.timing[subject_noun] = self.command.timing.get(
+        subject_noun,
+        {'total': 0, 'format': '(%f seconds)'})
+    try:
+        try:
+            if generation is not None and generation == interpreter.generation:
+                # CSS can still have hidden them, like a menu that was
+                # hovered over
+                valid = interpreter.webdriver.execute_script(elements_displayed_js, list(elements))
+            else:
+                predicates, checks = noun_checks(nouns)
+                valid = interpreter.webdriver.execute_script(
+                    elements_valid_js % ",\n".join(
+                        "function(elements, args) {%s}" % body for body in predicates),
+                    list(elements),
+                    checks)
+        except WebDriverException, wde:
+            # One of them went stale
+            valid = False
+        el = None
+        if valid:
+            el = next(apply_filters([elements[0]], self.command.verb.filters, subject_noun), None)
+        if not el:
+            interpreter.subject_elements.discard(key)
+            self.command.timing[subject_noun].pop('reused', None)
+            return None
+        interpreter.subject_elements.hits += 1
+        for noun, element in zip(nouns, elements):
+            # The command's window is the one they were found in
+            noun.window_handle = noun.window_handle or self.command.window_handle
+            noun.element = element
+        self.command.timing[subject_noun]['reused'] = True
+        if self.command.verbose:
+            print "VERBOSE: NOUN: REUSED: (%f seconds) Used the element found before for '%s'" % (time.time() - start, subject_noun.code)
+        hover_noun(subject_noun, interpreter, el, self.command)
+        return el
+    finally:
+        self.command.timing[subject_noun]['total'] += (time.time() - start)
+
 # Function for interpreting a Subject to a webelement
 def interpret_subject(self, interpreter):
+    if interpreter.memoize_locators:
+        interpreter.update_generation()
+    try:
+        return locate_subject(self, interpreter)
+    finally:
+        # Only what's found while the generation is known to be current
+        # can use it
+        interpreter.generation = None
+
+def locate_subject(self, interpreter):
+    key = None
+    if interpreter.reuse_subjects and self.nouns:
+        # The nouns in the command's window; the window the command is
+        # in was found before the subject is
+        nouns = list(self.get_context_nouns(
+            get_compare_handle=lambda driver:self.command.window_handle))
+        key = subject_key(nouns)
+        if key:
+            el = reuse_subject(self, interpreter, nouns, key)
+            if el:
+                return el
+
     # Get the nouns that are not cached and don't have ids
     nounpath = []
     context = interpreter.webdriver
@@ -944,6 +2244,11 @@ def interpret_subject(self, interpreter):
             end = time.time()
             self.command.timing[noun]['total'] += (end - start)
 
+    if key and context:
+        elements = [getattr(noun, 'element', None) for noun in nouns]
+        if all(isinstance(el, WebElement) for el in elements) and elements[0] == context:
+            interpreter.subject_elements.put(key, self.command.window_handle, elements, interpreter.generation)
+
     return context
 
 # Functions for interpretting Verbs
@@ -1071,16 +2376,23 @@ def interpret_load_test(self, interpreter, ele, running=True):
             interpreter.parser.scanner = interpreter.parser.scanners[filename]
         except KeyError as key:
             abs_path = os.path.abspath(os.path.join(interpreter.tests_dir, filename))
-            try:
-                with open(abs_path, 'rb') as testfile:
-                    interpreter.parser.scanner = interpreter.parser.file_scanner_class(
-                        filename=filename,
-                        filish=testfile,
-                        tokenizer=visionscanner.BasicTokenizer(commandtype=visionparser.InterpreterCommand),
-                        parser=interpreter.parser)
-            except IOError, ioe:
-                print "There was a problem loading the file '%s'" % abs_path
-                raise
+            preloaded = interpreter.preloaded_scanners.pop(filename, None)
+            if preloaded:
+                # The test was scanned ahead of time
+                preloaded.parser = interpreter.parser
+                interpreter.parser.scanner = preloaded
+            else:
+                try:
+                    with open(abs_path, 'rb') as testfile:
+                        interpreter.parser.scanner = interpreter.parser.file_scanner_class(
+                            filename=filename,
+                            filish=testfile,
+                            tokenizer=visionscanner.BasicTokenizer(commandtype=visionparser.InterpreterCommand),
+                            parser=interpreter.parser,
+                            cache_dir=interpreter.parse_cache_dir)
+                except IOError, ioe:
+                    print "There was a problem loading the file '%s'" % abs_path
+                    raise
         if not running:
             # We don't want to RUN the test, just load it
             interpreter.parser.scanner = interpreter.parser.interactive_scanner
@@ -1276,7 +2588,7 @@ def interpret_show_input(self, interpreter, ele, getall):
         'line_number_width': (int(math.log10(max(com.lineno for com in self.parser.children))) + 1)}
     for (i, command) in enumerate(self.parser.children,1):
         before = line_format.format(
-            interpreter_code="I" if isinstance(command.verb, visionparser.InterpreterVerb) else " ",
+            interpreter_code="I" if command.for_interpreter else " ",
             removal_code="R" if command.removed else " ",
             error_code="E" if command.error else "S" if command.skip or [scope for scope in command.scopes if scope.skip] else " ",
             filename=command.scanner.name,
@@ -1472,7 +2784,7 @@ def interpret_require(self, interpreter, ele=None):
     if name not in interpreter.flags:
         interpreter.parser.subcommand_scanner.addline([
             'Set "%s"' % name.rsplit('.', 1)[0],
-            'Load test <%s>' % name ])
+            'Load test "%s"' % name ])
         self.command.url = interpreter.webdriver.current_url
         interpreter.parser.scanner = interpreter.parser.subcommand_scanner
     else:
@@ -1617,17 +2929,18 @@ def test_action(self):
     if not self.value:
         # We don't have a value.  Get the first noun, and use its value
         # to make one of our own
-        if visionparser.Noun not in self.command.number_of_tokens:
+        if visionparser.Noun not in self.command.requirements.number_of_tokens:
             # The command has to have a Noun, so if it doesn't have one
             # already, add it to the must have dict
-            self.command.must_have[visionparser.Noun] = self.command.must_have.get(visionparser.Noun, 1)
+            must_have = self.command.own_requirement('must_have')
+            must_have[visionparser.Noun] = must_have.get(visionparser.Noun, 1)
     return []
 
 def skip_action(self):
     # Skipped commands must have a comment, if it doesn't yet, mark that
     # it has to have one
     if not self.command.comment:
-        self.command.must_have[visionparser.Comment] = 1
+        self.command.own_requirement('must_have')[visionparser.Comment] = 1
 
     return []
 
@@ -1722,18 +3035,90 @@ def noun_ready(self, interpreter, ele):
     except:
         return False
 
+def _filter_name(filt):
+    return filt.__name__ if hasattr(filt, '__name__') else filt.func.__name__
+
 def filter_timing(el, filt, noun):
     # Handle profiling information for filters
     filter_start=time.time()
     try:
         return filt(el, noun=noun)
     finally:
-        noun.command.timing[noun][filt.__name__ if hasattr(filt, '__name__') else filt.func.__name__] = time.time() - filter_start
+        noun.command.timing[noun][_filter_name(filt)] = time.time() - filter_start
+
+# Runs filters on every element in arguments[0] at once.  The %s is
+# replaced by the filters' batch_js, each the body of a function that
+# takes the elements and the filter's arguments, which are in
+# arguments[1], and returns whether each element meets the filter.
+# Returns the elements that meet every filter, and how long each filter
+# took.
+batch_filters_js = timer_js + is_displayed_js + attribute_or_text_js + """
+var predicates = [%s];
+var elements = arguments[0];
+var times = [];
+for (var f = 0; f < predicates.length; f++) {
+    var start = now();
+    var meets = predicates[f](elements, arguments[1][f]);
+    var kept = [];
+    for (var i = 0; i < elements.length; i++) {
+        if (meets[i]) {
+            kept.push(elements[i]);
+        }
+    }
+    elements = kept;
+    times.push((now() - start) / 1000);
+}
+return [elements, times];
+"""
+
+def _batch_js(filt):
+    return getattr(getattr(filt, 'func', filt), 'batch_js', None)
+
+def apply_filters(elements, filters, noun):
+    """
+    Returns an iterator over the elements that meet every filter, in
+    order.  Filters are run on one element at a time, lazily, since
+    they can be slow.
+
+    With the interpreter's batch_filters on, the filters at the start of
+    filters that have a batch_js are run on every element first, all in
+    one call to the browser.  If that call fails, say because an element
+    went stale, they're run one element at a time instead.
+    """
+    batched = []
+    if noun.parser.interpreter.batch_filters:
+        batched = list(itertools.takewhile(_batch_js, filters))
+    if batched and elements:
+        try:
+            elements, times = noun.parser.interpreter.webdriver.execute_script(
+                batch_filters_js % ",\n".join(
+                    "function(elements, args) {%s}" % _batch_js(filt) for filt in batched),
+                elements,
+                [getattr(filt, 'func', filt).batch_arguments(noun, **(getattr(filt, 'keywords', None) or {}))
+                    for filt in batched])
+            for filt, total in zip(batched, times):
+                noun.command.timing[noun][_filter_name(filt)] = total
+            filters = filters[len(batched):]
+        except WebDriverException, wde:
+            pass
+    elements = iter(elements)
+    for filt in filters:
+        elements = itertools.ifilter(functools.partial(filter_timing, filt=filt, noun=noun), elements)
+    return elements
 
 def _displayed_filter(e, noun):
     result = e.is_displayed()
     return result
 
+_displayed_filter.batch_js = """
+    var meets = [];
+    for (var i = 0; i < elements.length; i++) {
+        meets.push(isDisplayed(elements[i]));
+    }
+    return meets;
+"""
+_displayed_filter.batch_arguments = lambda noun: None
+
 def _exact_filter(e, noun, attribute):
     # verify the widget has the right value
     if not noun.value:
@@ -1752,6 +3137,24 @@ def _starts_with_filter(e, noun, attribute):
         result = elval.startswith(str(noun.value))
     return result
 
+_exact_filter.batch_js = """
+    var meets = [];
+    for (var i = 0; i < elements.length; i++) {
+        meets.push(args[0] === null || attributeOrText(elements[i], args[1]) === args[0]);
+    }
+    return meets;
+"""
+_exact_filter.batch_arguments = lambda noun, attribute: (str(noun.value) if noun.value else None, attribute)
+
+_starts_with_filter.batch_js = """
+    var meets = [];
+    for (var i = 0; i < elements.length; i++) {
+        meets.push(args[0] === null || attributeOrText(elements[i], args[1]).indexOf(args[0]) == 0);
+    }
+    return meets;
+"""
+_starts_with_filter.batch_arguments = _exact_filter.batch_arguments
+
 def _widget_value_filter(e, noun):
     # Verify the row has a widget that starts with the right value
     if noun.value and not [el for el in e.find_elements_by_xpath("./descendant::td[starts-with(normalize-space(), %s)]" % noun.value.compile()) if el.is_displayed()]:
@@ -2026,6 +3429,103 @@ def browser_internetexplorer(browser_options):
     else:
         return webdriver.Ie()
 
+class RequireResolver(object):
+    """
+    Finds every test that the entry tests Require, directly or through
+    other required tests, and scans them ahead of time.
+
+    After resolve, scanners has the scanned tests by filename, requires
+    has the (line number, filename) of each Require in each test, and
+    missing has the tests that couldn't be loaded, with the reason.
+    """
+
+    def __init__(self, tests_dir="", parse_cache_dir="", file_scanner_class=visionscanner.VisionFileScanner):
+        self.tests_dir = tests_dir
+        self.parse_cache_dir = parse_cache_dir
+        self.file_scanner_class = file_scanner_class
+        self.scanners = collections.OrderedDict()
+        self.requires = collections.OrderedDict()
+        self.missing = collections.OrderedDict()
+
+    @staticmethod
+    def test_filename(name):
+        """
+        The filename Load test uses for a test name
+        """
+        return name if "." in name else name + ".vision"
+
+    def scan(self, filename):
+        """
+        Scans the test, returning the filename, the scanner and the
+        Requires in it.  The scanner is None if the test can't be read.
+        """
+        abs_path = os.path.abspath(os.path.join(self.tests_dir, filename))
+        try:
+            with open(abs_path, 'rb') as testfile:
+                scanner = self.file_scanner_class(
+                    filename=filename,
+                    filish=testfile,
+                    tokenizer=visionscanner.BasicTokenizer(commandtype=visionparser.InterpreterCommand),
+                    cache_dir=self.parse_cache_dir)
+        except IOError, ioe:
+            return filename, None, str(ioe)
+
+        requires = []
+        for i in scanner.token_lines.get('require', ()):
+            code = visionscanner.VisionScanner.format_line(scanner, scanner.lines[i]['code'])
+            tokens, remainder = scanner.tokenizer.scanline_with_remainder(code)
+            verbs = [token for token in tokens if token.type == 'require']
+            literals = [
+                token for token in tokens[tokens.index(verbs[0]):]
+                if isinstance(token, visionparser.Literal)] if verbs else []
+            if literals:
+                name = literals[0].identifier.strip("'\"")
+                requires.append((i + 1, self.test_filename(name)))
+        return filename, scanner, requires
+
+    def resolve(self, testnames):
+        """
+        Scans the tests named, and everything they require, in the order
+        they're found.  Scanning is all Python, so it's done one test at
+        a time; threads would only take turns.
+        """
+        pending = collections.deque(self.test_filename(name) for name in testnames)
+        while pending:
+            filename = pending.popleft()
+            if filename in self.scanners or filename in self.missing:
+                continue
+            filename, scanner, requires = self.scan(filename)
+            if scanner is None:
+                self.missing[filename] = requires
+                continue
+            self.scanners[filename] = scanner
+            self.requires[filename] = requires
+            pending.extend(required for lineno, required in requires)
+        return self.scanners
+
+    @property
+    def cycles(self):
+        """
+        The chains of tests that end up requiring themselves, each as a
+        list of filenames that starts and ends with the same test
+        """
+        cycles = []
+        finished = set()
+
+        def visit(filename, path):
+            if filename in path:
+                cycles.append(path[path.index(filename):] + [filename])
+                return
+            if filename in finished:
+                return
+            for lineno, required in self.requires.get(filename, ()):
+                visit(required, path + [filename])
+            finished.add(filename)
+
+        for filename in self.requires:
+            visit(filename, [])
+        return cycles
+
 class VisionInterpreter(object):
     """
     This sets up the compilation functions that turn the parse tree into
@@ -2103,6 +3603,7 @@ class VisionInterpreter(object):
             'interprets': {
                 'alert': interpret_alert,
                 'cell': interpret_cell,
+                'row': interpret_row,
             },
             # verify the element is ready after getting it
             'readies': {
@@ -2335,6 +3836,21 @@ class VisionInterpreter(object):
 #        'safari': browser_safari,
     }
 
+    # Which nouns are hovered over once they're found: 'always' every
+    # noun, 'subject' only the noun a command is about and not the nouns
+    # it's in, 'verbs' only that noun, and only for hover_verbs, 'never'
+    # none of them.  Whatever the policy, the noun Hover over is about is
+    # hovered over, since that's all the verb does.
+    hover_policies = ('always', 'subject', 'verbs', 'never')
+    hover_verbs = frozenset(['click', 'hover over'])
+
+    # How nouns are found: 'webdriver' searches each xpath with its own
+    # WebDriver call, 'browser' searches them all with one script
+    locators = {
+        'webdriver': locator_func,
+        'browser': browser_locator_func,
+    }
+
     browser_profile = {
         'dom.max_chrome_script_run_time': 60,
         'browser.download.folderList': 2,
@@ -2358,6 +3874,13 @@ class VisionInterpreter(object):
         results_dir="",
         screenshot_dir="",
         upload_dir="",
+        parse_cache_dir="",
+        compact_history=False,
+        locator='webdriver',
+        batch_filters=False,
+        hover_policy='always',
+        reuse_subjects=False,
+        memoize_locators=False,
         webdriver=None):
         self.setup()
         if not webdriver:
@@ -2381,6 +3904,32 @@ class VisionInterpreter(object):
         self.screenshot_dir = screenshot_dir
         self.results_dir = results_dir
         self.upload_dir = upload_dir
+        self.parse_cache_dir = parse_cache_dir
+        self.compact_history = compact_history
+        self.locator = locator
+        self.batch_filters = batch_filters
+        self.hover_policy = hover_policy
+        self.reuse_subjects = reuse_subjects
+
+        # The elements the subjects of recent commands were found as,
+        # see interpret_subject
+        self.subject_elements = SubjectElementCache()
+
+        # What nouns were found as in the current DOM generation, while
+        # located_command is retried, see update_generation
+        self.memoize_locators = memoize_locators
+        self.generation = None
+        self.located_generation = None
+        self.located_command = None
+        self.located = {}
+
+        # How many nouns were hovered over, how many weren't, and how
+        # long hovering took, for each hover policy used
+        self.hover_timing = {}
+
+        # Scanners for tests that were scanned before they were loaded,
+        # see preload_tests
+        self.preloaded_scanners = {}
         self.debug = debug
         self.timing = timing
 
@@ -2393,6 +3942,20 @@ class VisionInterpreter(object):
     def __iter__(self):
         return self
 
+    def preload_tests(self, testnames):
+        """
+        Scans the tests named, and every test they Require, so that
+        loading them later doesn't have to.  Returns the RequireResolver
+        used, which knows about tests that couldn't be loaded and
+        Require cycles.
+        """
+        resolver = RequireResolver(
+            tests_dir=self.tests_dir,
+            parse_cache_dir=self.parse_cache_dir,
+            file_scanner_class=self.parser.file_scanner_class)
+        self.preloaded_scanners.update(resolver.resolve(testnames))
+        return resolver
+
     @property
     def acceptable_wait(self):
         if self.parser.scanner is self.parser.interactive_scanner:
@@ -2492,6 +4055,9 @@ class VisionInterpreter(object):
         except Exception as e:
             command = e.command
             self.errorfound = True
+            # What the scanner couldn't read, if there was something,
+            # explains the parser's error
+            e = command.error or e
             if not isinstance(e, visionexceptions.VisionException):
                 e = visionexceptions.GarbageInputError(
                     command=command,
@@ -2510,6 +4076,11 @@ class VisionInterpreter(object):
         ele = None
 
         command.executed = True
+        if command is not self.located_command:
+            # What was found for the last command can have been hidden
+            # or shown since without the DOM changing, like by hovering
+            self.located.clear()
+            self.located_command = command
         try:
             if command.check_readyState:
                 # If this is a command that cares whether we are ready,
@@ -2650,7 +4221,12 @@ class VisionInterpreter(object):
                     if command.uses_elements and command.subject:
                         for noun in command.subject.nouns:
                             if noun in command.timing:
-                                if 'times_found' not in command.timing[noun]:
+                                if command.timing[noun].get('reused'):
+                                    warning['subwarnings'].append(
+                                        "Noun '%s': took a total of %f seconds to check the element found for an earlier command" % (
+                                            noun.code,
+                                            command.timing[noun]['total']))
+                                elif 'times_found' not in command.timing[noun]:
                                     # This noun doesn't support timing
                                     # information, continue
                                     warning['subwarnings'].append(
@@ -2672,6 +4248,12 @@ class VisionInterpreter(object):
                                     for name, total in ((filter_name, filter_total) for filter_name, filter_total in command.timing[noun].items() if "_filter" in filter_name):
                                         warning['subwarnings'].append(
                                             "Time to filter elements with %s: %f seconds" % (name, total))
+                                    if 'hover' in command.timing[noun]:
+                                        warning['subwarnings'].append(
+                                            "Time to hover over the element: %f seconds" % command.timing[noun]['hover'])
+                                    if command.timing[noun].get('memoized'):
+                                        warning['subwarnings'].append(
+                                            "The page didn't change before a retry, so the element found was used again")
                                 else:
                                     warning['subwarnings'].append(
                                         "'%s': was not found after %f seconds" % (
@@ -2757,6 +4339,11 @@ class VisionInterpreter(object):
         for command in self:
             if command:
                 self.handle_output(command)
+                if self.compact_history:
+                    # The outputs are done with the capture
+                    if hasattr(command, 'capture'):
+                        del command.capture
+                    self.parser.compact(command)
         else:
             self.parser.scanner = self.parser.interactive_scanner
 
@@ -2802,6 +4389,47 @@ class VisionInterpreter(object):
                     for callable_type, activities in callables.items():
                         cls.add_callables(callable_type, activities)
 
+        # The tokens may have changed, so the tokenizers need to rebuild
+        # their tables, and the nouns may compile differently
+        visionscanner.BasicTokenizer.clear_tables()
+        xpath_plans.clear()
+
+    def should_hover(self, noun, requesting_command):
+        """
+        Whether noun should be hovered over now that it's been found for
+        requesting_command, according to the hover policy.  Hover over
+        always hovers over its subject.
+        """
+        if self.hover_policy == 'always':
+            return True
+        verb_type = requesting_command.verb.type if requesting_command.verb is not None else None
+        if self.hover_policy == 'never' and verb_type != 'hover over':
+            return False
+        subject = requesting_command.subject
+        if not subject or noun is not next(subject.window_context_nouns, None):
+            # This noun is only context
+            return False
+        return (
+            self.hover_policy == 'subject' or
+            verb_type in self.hover_verbs)
+
+    def record_hover(self, total):
+        """
+        Notes that a noun was hovered over, taking total seconds, or
+        wasn't if total is None
+        """
+        timing = self.hover_timing.setdefault(
+            self.hover_policy, {
+                'hovered': 0,
+                'skipped': 0,
+                'total': 0
+            })
+        if total is None:
+            timing['skipped'] += 1
+        else:
+            timing['hovered'] += 1
+            timing['total'] += total
+
     def scroll(self, x=0, y=0, ele=None):
         """
         Scroll the given element to put its upper left at the given
@@ -2818,6 +4446,28 @@ class VisionInterpreter(object):
                 arguments[0].scrollTop = arguments[2];""",
                 ele, x, y)
 
+    def dom_generation(self):
+        """
+        Returns a string that changes whenever the page does, read with
+        one short script, or None if the browser can't tell
+        """
+        try:
+            return self.webdriver.execute_script(dom_generation_js)
+        except WebDriverException, wde:
+            return None
+
+    def update_generation(self):
+        """
+        Reads the DOM generation, and forgets what nouns were found as
+        if it's changed, so that looking for them again, like when a
+        command is retried, only searches the page if it's changed.
+        """
+        self.generation = self.dom_generation()
+        if self.generation is None or self.generation != self.located_generation:
+            self.located.clear()
+            self.located_generation = self.generation
+        return self.generation
+
     @property
     def viewport(self):
         return self.webdriver.execute_script("return {'width': window.innerWidth, 'height': window.innerHeight};")
@@ -2828,54 +4478,30 @@ class VisionInterpreter(object):
         the screen.  There are horizontal and vertical flags that
         indicate which axis on which to center.
 
-        If the element has ancestor elements that are scrollable, it
-        will do this recursively.
+        If the element has ancestor elements that are scrollable, they
+        are scrolled to center it too.
 
         el - the WebElement to center
         parent_el - the parent WebElement in which to center el.  If
         this is None, we find all ancestors, if False, we center inside
         the window itself
         """
-        if parent_el is None:
-            # We weren't given a parent, so we need to get all parents
-            # that have scrollbars
-            scroll_parents = self.webdriver.execute_script("""
-                var parent = arguments[0].parentNode;
-                var parents = [];
-                while(typeof(parent) !== 'undefined' && parent !== null && parent.tagName.toLowerCase() !== 'body' && parent.tagName.toLowerCase() !== 'html'){
-                    if(
-                    typeof(parent.scrollHeight) !== 'undefined' &&
-                        typeof(parent.scrollWidth) !== 'undefined' &&
-                        typeof(parent.clientHeight) !== 'undefined' &&
-                        typeof(parent.clientWidth) !== 'undefined'){
-                        // This node might have scrollbars
-                        var overflow_x = window.getComputedStyle(parent).getPropertyValue('overflow-y');
-                        var overflow_y = window.getComputedStyle(parent).getPropertyValue('overflow-x');
-                        if((overflow_x !== 'visible' && overflow_x !== 'hidden' && parent.scrollWidth > parent.clientWidth) ||
-                           (overflow_y !== 'visible' && overflow_y !== 'hidden' && parent.scrollHeight > parent.clientHeight))
-                        {
-                            // It does have scrollbars, keep it.
-                            parents.unshift(parent);
-                        }
-                    }
-                    parent = parent.parentNode;
-                }
-                return parents;""", el)
-            for parent, child in zip([False] + scroll_parents, scroll_parents + [el]):
-                self.center_element(child, parent, horizontal=horizontal, vertical=vertical)
-        else:
-            # Center inside the window
-            viewport = parent_el.size if parent_el else self.viewport
-            viewport_location = parent_el.location if parent_el else {'x': 0, 'y': 0}
-            middle = [el.location['x'] + el.size['width'] / 2 - viewport_location['x'], el.location['y'] + el.size['height'] / 2 - viewport_location['y']]
-            points = [max(0, middle[0] - viewport['width'] / 2), max(0, middle[1] - viewport['height'] / 2)]
-            self.scroll(
-                x=points[0] if horizontal else self.webdriver.execute_script("return arguments[0].scrollLeft;", parent_el) if parent_el else self.webdriver.execute_script("return window.scrollX;"),
-                y=points[1] if vertical else self.webdriver.execute_script("return arguments[0].scrollTop;", parent_el) if parent_el else self.webdriver.execute_script("return window.scrollY;"),
-                ele=parent_el)
-
+        self.centered_rect(el, parent_el, horizontal=horizontal, vertical=vertical)
         return el
 
+    def centered_rect(self, el, parent_el=None, horizontal=True, vertical=True):
+        """
+        Centers el like center_element, and returns its bounding client
+        rect once it's centered.  This is all done with one script.
+        """
+        return self.webdriver.execute_script(
+            center_js + "return centerElement(arguments[0], arguments[1], arguments[2], arguments[3], arguments[4]);",
+            el,
+            parent_el or None,
+            parent_el is None,
+            horizontal,
+            vertical)
+
     @property
     def flags(self):
         self.flags = getattr(self, '_flags', collections.OrderedDict())
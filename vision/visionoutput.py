@@ -50,7 +50,7 @@ class VisionOutput(object):
         outputs[None] = self.output_unparsed_command
 
     def print_command(self, command, code="", success=None):
-        scope_level = sum(c.scopechange for c in command.parser.children)
+        scope_level = command.parser.total_scopechange
         if getattr(command.verb, 'type', None) in ('require', 'test', 'validate'):
             scope_level = max(0, scope_level - 1)
         indent = "".join(["    "] * scope_level)
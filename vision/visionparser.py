@@ -4,7 +4,6 @@ import itertools
 import re
 import sys
 import types
-import copy
 import visionexceptions
 import time
 import os
@@ -92,7 +91,63 @@ def get_subclasses(cl, found=None):
         yield sub
         found.update(sub.__subclasses__())
 
+class TokenCursor(object):
+    """
+    An iterator over the tokens of a line that tokens can be peeked at
+    and pushed back onto.
+
+    The tokens are kept in a stack, with the next token on top, so
+    peeking and pushing back cost the same no matter how many times it
+    has been done.
+    """
+
+    def __init__(self, tokens=()):
+        self.stack = list(tokens)
+        self.stack.reverse()
+
+    def __iter__(self):
+        return self
+
+    def __len__(self):
+        return len(self.stack)
+
+    def next(self):
+        try:
+            return self.stack.pop()
+        except IndexError, ie:
+            raise StopIteration()
+
+    def peek(self):
+        """
+        Returns the next token without taking it.  Raises StopIteration
+        if there are no more tokens.
+        """
+        try:
+            return self.stack[-1]
+        except IndexError, ie:
+            raise StopIteration()
+
+    def push(self, tokens):
+        """
+        Puts the tokens back, so that the first of them is the next one
+        """
+        self.stack.extend(reversed(list(tokens)))
+
+    @classmethod
+    def join(cls, tokenstream, rest=None):
+        """
+        Returns a cursor that gives the tokens in tokenstream, and then
+        the ones left in rest.  If tokenstream is already a cursor, it is
+        used, rather than copied.
+        """
+        cursor = tokenstream if isinstance(tokenstream, cls) else cls(tokenstream)
+        if rest is not None and rest is not cursor:
+            cursor.stack[0:0] = reversed(list(rest))
+        return cursor
+
 class Typed(object):
+    __slots__ = ()
+
     def __init__(self, identifier, token_type=None):
         super(Typed, self).__init__()
         self.identifier=identifier
@@ -131,6 +186,8 @@ class Compileable(Typed):
     actual mappings must be provided by the compiler, NOT HERE.
     This is because this file is to be agnostic of the output format
     """
+    __slots__ = ()
+
     compiles = collections.defaultdict( lambda:
         lambda self, nots=(), base_axis=None: self.identifier )
 
@@ -153,6 +210,8 @@ class Interpretable(Typed):
     actual mappings must be provided by the interpreter, NOT HERE.
     This is because this file is to be agnostic of the output format
     """
+    __slots__ = ()
+
     interprets = collections.defaultdict( lambda:
         lambda self, interpreter=None, ele=None: self.identifier )
 
@@ -175,6 +234,7 @@ class Parseable(Typed):
     actual mappings must be provided by the interpreter, NOT HERE.
     This is because this file is to be agnostic of the output format
     """
+    __slots__ = ()
 
     actions = collections.defaultdict( lambda:
         lambda parseable, *args, **kwargs: [] )
@@ -199,7 +259,7 @@ class Parseable(Typed):
         return []
 
     def parse(self, tokenstream):
-        self.tokenstream = itertools.chain(tokenstream, getattr(self, 'tokenstream', []))
+        self.tokenstream = TokenCursor.join(tokenstream, getattr(self, 'tokenstream', None))
         while not self.done:
             try:
                 token = iter(self).next()
@@ -211,12 +271,84 @@ class Parseable(Typed):
     def command(self):
         return self.parent.command
 
+class Requirements(object):
+    """
+    The requirement tables of a Phrase: expected, number_of_tokens,
+    must_have, cant_have and must_be_together.
+
+    The tables start out as the class defaults, shared by every
+    instance of the class.  A table is only copied, through writable,
+    the first time it has to change.
+    """
+
+    __slots__ = (
+        'expected',
+        'number_of_tokens',
+        'must_have',
+        'cant_have',
+        'must_be_together',
+        'owned',
+        'shared')
+
+    def __init__(self, expected=(), number_of_tokens={}, must_have={}, cant_have={}, must_be_together=(), shared=False):
+        self.expected = expected
+        self.number_of_tokens = number_of_tokens
+        self.must_have = must_have
+        self.cant_have = cant_have
+        self.must_be_together = must_be_together
+        self.owned = ()
+        self.shared = shared
+
+    @classmethod
+    def for_class(cls, phrase_type):
+        """
+        The shared requirements for instances of phrase_type
+        """
+        if '_requirements_default' not in phrase_type.__dict__:
+            setattr(phrase_type, '_requirements_default', cls(
+                expected=phrase_type.expected,
+                number_of_tokens=phrase_type.number_of_tokens,
+                must_have=phrase_type.must_have,
+                cant_have=phrase_type.cant_have,
+                must_be_together=phrase_type.must_be_together,
+                shared=True))
+        return phrase_type.__dict__['_requirements_default']
+
+    def copy(self):
+        """
+        Unshared requirements, still pointing at the same tables
+        """
+        requirements = type(self)(
+            expected=self.expected,
+            number_of_tokens=self.number_of_tokens,
+            must_have=self.must_have,
+            cant_have=self.cant_have,
+            must_be_together=self.must_be_together)
+        return requirements
+
+    def writable(self, name):
+        """
+        Returns the table name, copying it first if it is still shared
+        """
+        if self.shared:
+            raise ValueError("Shared requirements can't be written")
+        table = getattr(self, name)
+        if name not in self.owned:
+            if hasattr(table, 'keys'):
+                table = dict(table)
+            else:
+                table = list(table)
+            setattr(self, name, table)
+            self.owned += (name,)
+        return table
+
 class Phrase(Parseable, Interpretable, Compileable):
     """
     Abstract class
 
     A parser that stores tokens in an internal list.
     """
+    __slots__ = ()
 
     # Tokens that can be consumed by this parser
     expected=()
@@ -242,15 +374,27 @@ class Phrase(Parseable, Interpretable, Compileable):
         super(Phrase, self).__init__(
             identifier=identifier or 'phrase',
             token_type=token_type)
-        self.children=[]
+        if type(self).children:
+            # Phrases that can't adopt anything keep the class's empty
+            # tuple
+            self.children=[]
         self._last_token = None
 
-        # Make copies of the class objects in this object
-        self.expected = list(type(self).expected)
-        self.number_of_tokens = dict(type(self).number_of_tokens)
-        self.must_have = copy.deepcopy(type(self).must_have)
-        self.cant_have = copy.deepcopy(type(self).cant_have)
-        self.must_be_together = list(type(self).must_be_together)
+        # Share the class requirements until they change
+        self._requirements = Requirements.for_class(type(self))
+
+    @property
+    def requirements(self):
+        return self._requirements
+
+    def own_requirement(self, name):
+        """
+        Returns this Phrase's own copy of the requirement table name,
+        to be changed in place
+        """
+        if self._requirements.shared:
+            self._requirements = self._requirements.copy()
+        return self._requirements.writable(name)
 
     def __iter__(self):
         return self
@@ -259,13 +403,9 @@ class Phrase(Parseable, Interpretable, Compileable):
     def done(self):
         done = False
         try:
-            token = self.tokenstream.next()
-            if token is self._last_token:
+            if self.tokenstream.peek() is self._last_token:
                 # This is the same token we got last time, we're done
                 done = True
-            self.tokenstream = itertools.chain(
-                [token],
-                self.tokenstream)
         except StopIteration, si:
             # We couldn't find any more, we're done
             done = True
@@ -301,11 +441,10 @@ class Phrase(Parseable, Interpretable, Compileable):
             while not self.done:
                 token = self.tokenstream.next()
                 self._last_token = token
-                if isinstance(token, tuple(self.expected)):
+                if isinstance(token, tuple(self.requirements.expected)):
                     yield token
                 elif token:
-                    self.tokenstream = itertools.chain(
-                        [token], self.tokenstream)
+                    self.tokenstream.push([token])
                     break
 
         token = None
@@ -327,27 +466,29 @@ class Phrase(Parseable, Interpretable, Compileable):
         """
         # We iterate a copy of the list so that removing
         # items doesn't screw up our iterator
-        for k in list(self.expected):
+        for k in tuple(self.requirements.expected):
             if isinstance(token, k):
                 # The token is an instance of the current key, which
                 # means we need to update the number of the keys
-                self.number_of_tokens[k] = self.number_of_tokens.get(k, 0) + 1
-                if k in self.cant_have and self.cant_have[k] == self.number_of_tokens[k] + 1:
+                number_of_tokens = self.own_requirement('number_of_tokens')
+                number_of_tokens[k] = number_of_tokens.get(k, 0) + 1
+                cant_have = self.requirements.cant_have
+                if k in cant_have and cant_have[k] == number_of_tokens[k] + 1:
                     # We don't expect to see any more of this type of
                     # token.
-                    self.expected.remove(k)
-                    if k in self.must_be_together:
-                        self.must_be_together.remove(k)
+                    self.own_requirement('expected').remove(k)
+                    if k in self.requirements.must_be_together:
+                        self.own_requirement('must_be_together').remove(k)
 
         # We iterate a copy of the list so that removing
         # items doesn't screw up our iterator
-        for k in list(self.must_be_together):
-            if not isinstance(token, k) and self.number_of_tokens.get(k, 0)> 0:
+        for k in tuple(self.requirements.must_be_together):
+            if not isinstance(token, k) and self.requirements.number_of_tokens.get(k, 0)> 0:
                 # We've received tokens that must all be together, and
                 # then gotten a different one.  Remove the tokens from
                 # expected and from must_be_together
-                self.expected.remove(k)
-                self.must_be_together.remove(k)
+                self.own_requirement('expected').remove(k)
+                self.own_requirement('must_be_together').remove(k)
 
     def adopt(self, token):
         self.children.append(token)
@@ -371,9 +512,9 @@ class Phrase(Parseable, Interpretable, Compileable):
         # We're ending the token we're consumeing, call the handler
         # The handler might genreate new stream, so parse the
         # tokenstream it comes up with
-        return token.parse(itertools.chain(
-            token.handle_end(),
-            self.tokenstream))
+        added_stream = token.handle_end()
+        self.tokenstream.push(added_stream)
+        return token.parse(self.tokenstream)
 
     def handle_token(self, token, testvalue=None):
         token.parser=testvalue or self.parser
@@ -389,8 +530,9 @@ class Phrase(Parseable, Interpretable, Compileable):
         """
 
         unmet = []
-        for (need, howmany) in self.must_have.items():
-            if sum(v for (have, v) in self.number_of_tokens.items() if issubclass(need,have)) < howmany:
+        number_of_tokens = self.requirements.number_of_tokens
+        for (need, howmany) in self.requirements.must_have.items():
+            if sum(v for (have, v) in number_of_tokens.items() if issubclass(need,have)) < howmany:
                 # We haven't met the requirements for this
                 unmet.append(need)
         return tuple(unmet)
@@ -400,6 +542,26 @@ class InputPhrase(Phrase):
     A Phrase that takes place inside a single input.
     """
 
+    # There are a lot of these, keep the common attributes out of the
+    # instance dict.  Subclasses that don't list __slots__ get a dict
+    # for anything else.
+    __slots__ = (
+        'identifier',
+        'type',
+        'error',
+        'warnings',
+        'parent',
+        'parser',
+        'tokenstream',
+        'phrase_start',
+        'keyword_start',
+        'place',
+        '_last_token',
+        '_requirements',
+        '_action',
+        '_compile',
+        '_interpret')
+
     def __init__(self, identifier, start=0, place='selenium', token_type=None, scanner_args=None ):
         scanner_args=scanner_args or {}
         super(InputPhrase, self).__init__(
@@ -426,6 +588,8 @@ class InputPhrase(Phrase):
 class Literal(InputPhrase):
     """ A literal is an arbitrary string. """
 
+    __slots__ = ('_identifier',)
+
     def __init__(self, identifier, start=0, token_type=None, scanner_args=None):
         super(Literal, self).__init__(
             identifier=identifier,
@@ -596,6 +760,8 @@ class FileLiteral(Literal):
 class Ordinal(InputPhrase):
     """ A ordinal tells which Node of a Nodeset returned by XPath to use. """
 
+    __slots__ = ('_identifier',)
+
     special = '((1st)|(2nd)|(3rd)|(4th)|(5th)|(6th)|(7th)|(8th)|(9th)|(11th)|(12th)|(13th)|(14th)|(15th)|(16th)|(19th))'
     regexp = '%s|([1-9]\d*(%s|(0th)))' % (special, special)
 
@@ -672,8 +838,10 @@ class ValueObject(InputPhrase):
         # Get more arguments from the scanner
         cant_have=scanner_args.get('cant_have', {})
         must_have=scanner_args.get('must_have', {})
-        self.cant_have = copy.deepcopy(self.cant_have)
-        self.must_have = copy.deepcopy(self.must_have)
+        if not cant_have and not must_have:
+            # Nothing overrides the class requirements, keep sharing
+            # them
+            return
         if not hasattr(cant_have, 'keys'):
             # It's not mapping, make it one
             cant_have = dict((x, 1) for x in cant_have)
@@ -682,17 +850,18 @@ class ValueObject(InputPhrase):
             must_have = dict((x, 1) for x in must_have)
 
         # requirements given here override those of the class
-        self.cant_have.update(cant_have)
-        self.must_have.update(must_have)
-        for t in self.must_have:
-            if t not in self.expected:
-                self.expected.append(t)
-
-        for t in self.cant_have:
-            if t not in self.expected and self.cant_have[t] > 1:
+        self.own_requirement('cant_have').update(cant_have)
+        self.own_requirement('must_have').update(must_have)
+        requirements = self.requirements
+        for t in requirements.must_have:
+            if t not in requirements.expected:
+                self.own_requirement('expected').append(t)
+
+        for t in requirements.cant_have:
+            if t not in requirements.expected and requirements.cant_have[t] > 1:
                 # If we cant_have 2, we can have 1, so it must be
                 # expected
-                self.expected.append(t)
+                self.own_requirement('expected').append(t)
 
     def compile(self):
         if not hasattr( self, '_compile' ):
@@ -926,16 +1095,13 @@ class Context(ValueObject):
 
     @property
     def referent(self):
-        scope = 0
-        min_scope = 0
-        for command in self.command.commands_in_scope_iter:
-            if command.variable and str(command.variable.value) == str(self.value):
-                # This command defines the variable we use for
-                # context, get its subject
-                return command.subject
+        # Find the command that defines the variable we use for context
+        command = self.command.parser.get_scope_entry(self.command).contexts.lookup(str(self.value))
+        if command:
+            return command.subject
         else:
             # we're using a context that is undefined, raise an exception
-            raise visionexceptions.UndeclaredContextError(command=command)
+            raise visionexceptions.UndeclaredContextError(command=self.command)
 
 class SubjectPartStart(InputPhrase):
     expected = [Literal, Ordinal, Noun, Context]
@@ -960,11 +1126,10 @@ class SubjectPartStart(InputPhrase):
         # getting more than 1 Noun, and it will return parsing control
         # to the Command
         if isinstance(token, (Noun, Context)):
-            del self.must_have[Context]
-            del self.must_have[Noun]
-            self.tokenstream = itertools.chain(
-                [token] + self.children,
-                self.tokenstream)
+            must_have = self.own_requirement('must_have')
+            del must_have[Context]
+            del must_have[Noun]
+            self.tokenstream.push([token] + self.children)
             token.phrase_start = self.start
             return self.tokenstream
         return super(SubjectPartStart, self).consume(token)
@@ -973,7 +1138,7 @@ class ScopeChange(InputPhrase):
     """
     Marks the scope a line is on, one of these for each level of scope.
     """
-    pass
+    __slots__ = ()
 
 class Subject(Compileable, Interpretable):
     """
@@ -1288,12 +1453,16 @@ class Command(InputPhrase):
     yieldable = True
 
     def __init__(self, scanner, lineno, token_type=None, scanner_args=None):
-        self.removed = False
-        self.scopechange = 0
+        self._removed = False
+        self._scopechange = 0
+        self._error = None
+
+        # The children of each type we've been asked about, see
+        # children_of_type
+        self._children_by_type = {}
         self.lineno = lineno
         self.origin_scanner = self.scanner = scanner
         self.trace = None
-        self.error = None
         self.executed = False
         self.subcommands = False
         self.parser = scanner.parser
@@ -1312,17 +1481,9 @@ class Command(InputPhrase):
 
     def get_variable_from_scope(self, var):
         # var is a string that is the name of the variable
-        current_level = 0
-        min_level = 0
-        for command in self.previous_usable_commands_iter:
-            current_level -= command.scopechange
-            if current_level <= min_level:
-                # We only look at commands in scopes that are in the
-                # minimum level or below.  This ensures we are always in
-                # scope
-                min_level = current_level
-                if command.variable and str(command.variable.value) == var:
-                    return command.subject
+        command = self.parser.get_scope_entry(self).variables.lookup(var)
+        if command:
+            return command.subject
 
         # This should have an exception, I think
         raise visionexceptions.UndeclaredContextError(command=self)
@@ -1335,13 +1496,10 @@ class Command(InputPhrase):
 
     def handle_end(self):
         try:
-            tok = next(self.tokenstream)
+            self.tokenstream.peek()
 
             # At this point, we've finished parsing the Command but have
             # tokens left to consume.  raise an error
-            self.tokenstream = itertools.chain(
-                [tok],
-                self.tokenstream)
             raise visionexceptions.TooManyTokens(
                 command=self,
                 tokenstream=self.tokenstream)
@@ -1357,21 +1515,34 @@ class Command(InputPhrase):
         """
         stream = [t for t in tokenstream]
         self.tokens = getattr(self, 'tokens', stream)
-        self.tokenstream = iter(stream)
+        self.tokenstream = TokenCursor(stream)
         while not self.done:
             token = iter(self).next()
         self.parsed = True
         return self.tokenstream
 
+    def children_of_type(self, cls):
+        """
+        Returns a tuple of the children that are instances of cls.  These
+        are kept until another child is adopted.
+        """
+        try:
+            return self._children_by_type[cls]
+        except KeyError, ke:
+            children = self._children_by_type[cls] = tuple(
+                token for token in self.children if isinstance(token, cls))
+            return children
+
+    def first_child_of_type(self, cls):
+        """
+        Returns the first child that is an instance of cls, or None
+        """
+        children = self.children_of_type(cls)
+        return children[0] if children else None
+
     @property
     def comment(self):
-        comment_iter = itertools.ifilter(
-            lambda token: isinstance(token, Comment),
-            self.children)
-        try:
-            return next(comment_iter)
-        except StopIteration, si:
-            return None
+        return self.first_child_of_type(Comment)
 
     @property
     def code(self):
@@ -1398,24 +1569,23 @@ class Command(InputPhrase):
     @property
     def context(self):
         if not hasattr( self, "_context"):
-            for child in self.children:
-                if isinstance(child, Context):
-                    # If we have a context defined return it
-                    if str(child.value) == 'global':
-                        # If we're looking in the 'global' context, then
-                        # we don't want to return one here
-                        self._context = None
-                    else:
-                        try:
-                            self._context = child.referent
-                        except visionexceptions.UndeclaredContextError as uce:
-                            # The referent was never actually defined...
-                            # We'll pass this, and they'll get a none
-                            # for the context
-                            pass
-
-                    # We've found the context, break out
-                    break
+            for child in self.children_of_type(Context):
+                # If we have a context defined return it
+                if str(child.value) == 'global':
+                    # If we're looking in the 'global' context, then
+                    # we don't want to return one here
+                    self._context = None
+                else:
+                    try:
+                        self._context = child.referent
+                    except visionexceptions.UndeclaredContextError as uce:
+                        # The referent was never actually defined...
+                        # We'll pass this, and they'll get a none
+                        # for the context
+                        pass
+
+                # We've found the context, break out
+                break
             else:
                 # Search for context in scope
                 try:
@@ -1451,6 +1621,76 @@ class Command(InputPhrase):
     def end(self):
         return -1
 
+    @property
+    def error(self):
+        return self._error
+
+    @error.setter
+    def error(self, error):
+        self._error = error
+        self.scopes_changed()
+
+    @property
+    def removed(self):
+        return self._removed
+
+    @removed.setter
+    def removed(self, removed):
+        self._removed = removed
+        self.scopes_changed()
+
+    @property
+    def scopechange(self):
+        return self._scopechange
+
+    @scopechange.setter
+    def scopechange(self, scopechange):
+        self._scopechange = scopechange
+        self.scopes_changed()
+
+    def scopes_changed(self):
+        """
+        Tells the parser that the scopes of the commands after this one
+        need to be worked out again
+        """
+        index = getattr(self, 'parser_index', None)
+        if index is not None:
+            self.parser.invalidate_scopes(index)
+
+    @property
+    def for_interpreter(self):
+        """
+        Whether the command's verb is for the interpreter
+        """
+        return isinstance(self.verb, InterpreterVerb)
+
+    def release(self, elements=False):
+        """
+        Lets go of what was only needed while the command was parsed and
+        run: the tokens it was scanned into, the streams they were
+        parsed from and, if elements is set, the elements its nouns
+        found.
+        """
+        if hasattr(self, 'tokens'):
+            del self.tokens
+        self.tokenstream = None
+        self._last_token = None
+        self.trace = None
+        self.timings = {}
+        if hasattr(self, 'timing'):
+            self.timing = collections.OrderedDict()
+
+        tokens = list(self.children)
+        while tokens:
+            token = tokens.pop()
+            token.tokenstream = None
+            token._last_token = None
+            if elements and isinstance(token, Noun):
+                token._element = None
+            tokens.extend(token.children)
+        if elements and hasattr(self, '_subject'):
+            del self._subject
+
     @property
     def expected_scope_level(self):
         level = 0
@@ -1473,14 +1713,11 @@ class Command(InputPhrase):
         This is for internal use, so that we can use itertools for other
         things without actualizing the iterator at the beginning.
         """
-        prev_iter = reversed(self.parser.children)
-        if self in self.parser.children:
-            prev_iter = itertools.ifilter(
-                lambda token: token is not self,
-                itertools.dropwhile(
-                    lambda token:token is not self,
-                    reversed(self.parser.children)))
-        return prev_iter
+        children = self.parser.children
+        index = self.parser.index_of(self)
+        if index is None:
+            return reversed(children)
+        return (children[i] for i in xrange(index - 1, -1, -1))
 
     @property
     def previous_usable_commands_iter(self):
@@ -1505,22 +1742,17 @@ class Command(InputPhrase):
 
     @property
     def scope_iter(self):
-        def gen_scopes():
-            base_scope = scope_level = -1 * self.scopechange
-
-            for command in self.previous_commands_iter:
-                if command.usable and command.scopechange:
-                    # This way we take "End test" commands in account
-                    # when we count what scope we're in
-                    scope_level -= command.scopechange
-                    if scope_level < base_scope:
-                        base_scope = scope_level
-                        yield command
-        return gen_scopes()
+        """
+        The scopes this command is in, innermost first
+        """
+        return reversed(self.scopes)
 
     @property
     def scopes(self):
-        return tuple(reversed(tuple(self.scope_iter)))
+        """
+        The scopes this command is in, outermost first
+        """
+        return self.parser.get_scope_entry(self).scopes
 
     @property
     def usable(self):
@@ -1534,7 +1766,7 @@ class Command(InputPhrase):
     def subject(self):
         if not hasattr(self, "_subject"):
             context = self.context
-            nouns = list(token for token in self.children if isinstance(token, Noun))
+            nouns = list(self.children_of_type(Noun))
             if nouns or context:
                 self._subject = Subject(
                     command=self,
@@ -1544,13 +1776,7 @@ class Command(InputPhrase):
 
     @property
     def variable(self):
-        var = None
-        variables_iter = itertools.ifilter(lambda token:isinstance(token, Variable), self.children)
-        try:
-            var = next(variables_iter)
-        except StopIteration, si:
-            var = None
-        return var
+        return self.first_child_of_type(Variable)
 
     @property
     def variables_in_scope(self):
@@ -1562,38 +1788,23 @@ class Command(InputPhrase):
 
     @property
     def verb(self):
-        verbs_iter = itertools.ifilter(
-            lambda token: isinstance(token, Verb),
-            self.children)
-        try:
-            return next(verbs_iter)
-        except StopIteration, si:
-            return None
+        return self.first_child_of_type(Verb)
 
     @property
     def wait(self):
-        wait_iter = itertools.ifilter(
-            lambda token: isinstance(token, Wait),
-            self.children)
-        try:
-            return float(str(next(wait_iter).value))
-        except StopIteration, si:
-            return self.parser.scanner.maximum_time
+        wait = self.first_child_of_type(Wait)
+        if wait:
+            return float(str(wait.value))
+        return self.parser.scanner.maximum_time
 
     @property
     def verbose(self):
-        return self.parser.interpreter.verbose or bool([
-            token for token in self.children if isinstance(token, Verbose)])
+        return self.parser.interpreter.verbose or bool(
+            self.children_of_type(Verbose))
 
     @property
     def skip(self):
-        skip_iter = itertools.ifilter(
-            lambda token: isinstance(token, Skip),
-            self.children)
-        try:
-            return next(skip_iter)
-        except StopIteration, si:
-            return None
+        return self.first_child_of_type(Skip)
 
     @skip.setter
     def skip(self, literal):
@@ -1604,9 +1815,13 @@ class Command(InputPhrase):
                 Skip(identifier='is skipped', start=0),
                 Comment(identifier='because', start=0),
                 Literal(literal, start=0)])
+            self.scopes_changed()
 
     def adopt(self, token):
         adopt_ret = super(Command, self).adopt(token)
+
+        # The children have changed
+        self._children_by_type.clear()
         if hasattr(self, "_subject"):
             # If we already have a subject, get rid of it, because it
             # doesn't know about what we just adopted.
@@ -1644,6 +1859,245 @@ class InterpreterCommand(Command):
         except TypeError as te:
             return line.strip()
 
+class VerbSummary(object):
+    """
+    What a CommandSummary keeps of its command's verb
+    """
+
+    __slots__ = ('type', 'error', 'parser')
+
+    def __init__(self, verb):
+        self.type = verb.type
+        self.error = bool(verb.error)
+        self.parser = verb.parser
+
+    # Whether it's usable depends on whether the interpreter is
+    # interactive when it's asked
+    usable = Verb.usable
+
+class CommandSummary(object):
+    """
+    Stands in for a Command in its parser's children once nothing needs
+    the command's tokens anymore.  It keeps what's needed to work out
+    scopes, to Pop the command and to show or save the input.
+    """
+
+    __slots__ = (
+        'parser',
+        'parser_index',
+        'lineno',
+        'scanner',
+        'origin_scanner',
+        'parsed',
+        'code',
+        'type',
+        'verb',
+        'for_interpreter',
+        'skip',
+        'warnings',
+        'executed',
+        'subcommands',
+        '_error',
+        '_removed',
+        '_scopechange')
+
+    # Commands that define variables are never summarized
+    variable = None
+    subject = None
+    context = None
+
+    def __init__(self, command):
+        self.parser = command.parser
+        self.parser_index = command.parser_index
+        self.lineno = command.lineno
+        self.scanner = command.scanner
+        self.origin_scanner = command.origin_scanner
+        self.parsed = command.parsed
+        self.code = command.code
+        self.type = command.type
+        verb = command.verb
+        self.verb = VerbSummary(verb) if verb else None
+        self.for_interpreter = command.for_interpreter
+        self.skip = bool(command.skip)
+        self.warnings = command.warnings
+        self.executed = command.executed
+        self.subcommands = command.subcommands
+        self._error = self.summarize_error(command.error)
+        self._removed = command.removed
+        self._scopechange = command.scopechange
+
+    def summarize_error(self, error):
+        """
+        Errors can hold on to tokens and streams, keep just the message
+        """
+        if not error:
+            return error
+        return visionexceptions.VisionException(
+            command=self,
+            message=error.message)
+
+    @property
+    def command(self):
+        return self
+
+    @property
+    def error(self):
+        return self._error
+
+    @error.setter
+    def error(self, error):
+        self._error = self.summarize_error(error)
+        self.scopes_changed()
+
+    @property
+    def removed(self):
+        return self._removed
+
+    @removed.setter
+    def removed(self, removed):
+        self._removed = removed
+        self.scopes_changed()
+
+    @property
+    def scopechange(self):
+        return self._scopechange
+
+    @property
+    def filename(self):
+        return self.scanner.name
+
+    @property
+    def usable(self):
+        return bool(self.verb and self.verb.usable) and not self.removed
+
+    @property
+    def scopes(self):
+        return self.parser.get_scope_entry(self).scopes
+
+    @property
+    def scope_level(self):
+        return self.parser.get_scope_difference(to=self)
+
+    def scopes_changed(self):
+        self.parser.invalidate_scopes(self.parser_index)
+
+class ScopeEntry(object):
+    """
+    The scopes that are open at a point in the parser's children.
+
+    level is the scope level from the usable commands, total is the sum
+    of the scopechanges of all the commands, and scopes are the commands
+    whose scopes are open, outermost first.
+
+    The variables defined by usable commands, and the contexts that can
+    be used, are kept in SymbolTables.
+    """
+
+    __slots__ = ('level', 'total', 'scopes', 'scope_levels', 'variables', 'contexts')
+
+    def __init__(self, level=0, total=0, scopes=(), scope_levels=(), variables=None, contexts=None):
+        self.level = level
+        self.total = total
+        self.scopes = scopes
+
+        # The level each of the scopes was opened at
+        self.scope_levels = scope_levels
+        self.variables = variables or SymbolTable()
+        self.contexts = contexts or SymbolTable()
+
+    def after(self, command):
+        """
+        Returns the ScopeEntry for just after the command
+        """
+        scopechange = command.scopechange
+        usable = command.usable
+        level = self.level
+        scopes = self.scopes
+        scope_levels = self.scope_levels
+        variables = self.variables
+        contexts = self.contexts
+
+        if usable:
+            variables = variables.after(command)
+        if not (command.error or command.skip):
+            contexts = contexts.after(command)
+
+        if scopechange and usable:
+            # Close the scopes that were opened at or after the level
+            # we're going to, and open one if this command does
+            level += scopechange
+            open_scopes = len(scope_levels)
+            while open_scopes and scope_levels[open_scopes - 1] >= level:
+                open_scopes -= 1
+            scopes = scopes[:open_scopes]
+            scope_levels = scope_levels[:open_scopes]
+            if scopechange > 0:
+                scopes += (command,)
+                scope_levels += (self.level,)
+
+        return ScopeEntry(
+            level,
+            self.total + scopechange,
+            scopes,
+            scope_levels,
+            variables,
+            contexts)
+
+class SymbolTable(object):
+    """
+    The variables that can be seen at a point in the commands.
+
+    Variables are kept in a stack of frames, one for each scope level
+    with commands that define variables.  When a scope ends, the frames
+    above its level are thrown away.  Variables defined by a command
+    that opens a scope stay visible after the scope ends.  Tables are
+    never changed, each command that changes one makes a new one, so
+    they can be kept for every command.
+    """
+
+    __slots__ = ('level', 'frames')
+
+    def __init__(self, level=0, frames=()):
+        self.level = level
+
+        # (level, {variable name: command}) pairs, innermost last
+        self.frames = frames
+
+    def after(self, command):
+        """
+        Returns the SymbolTable for just after the command
+        """
+        frames = self.frames
+        variable = command.variable
+        if variable:
+            if frames and frames[-1][0] == self.level:
+                level, names = frames[-1]
+                names = dict(names)
+                frames = frames[:-1]
+            else:
+                names = {}
+            names[str(variable.value)] = command
+            frames += ((self.level, names),)
+
+        level = self.level + command.scopechange
+        while frames and frames[-1][0] > level:
+            # This frame's scope has ended
+            frames = frames[:-1]
+
+        if frames is self.frames and level == self.level:
+            return self
+        return SymbolTable(level, frames)
+
+    def lookup(self, name):
+        """
+        Returns the most recent command that defines the variable, or
+        None if there isn't one
+        """
+        for level, names in reversed(self.frames):
+            if name in names:
+                return names[name]
+        return None
+
 class VisionParser(Phrase):
     """
     This the parser for Vision.  It is iterable, and returns one command
@@ -1662,10 +2116,21 @@ class VisionParser(Phrase):
         super(VisionParser, self).__init__()
         self.scanner = scanner
 
+        # Scope entries for the children, see get_scope_entry
+        self._scope_entries = None
+        self._scope_interactivity = None
+        self._scopes_valid = 0
+
+        # How far compact has gone through the children, and the scope
+        # openers it kept that still have elements
+        self._compacted = 0
+        self._holding_elements = []
+
     def adopt(self, token):
         try:
             return super(VisionParser, self).adopt(token)
         finally:
+            token.parser_index = len(self.children) - 1
             token.parsed = True
 
     def can_yield(self, token):
@@ -1683,24 +2148,110 @@ class VisionParser(Phrase):
     def get_scope_difference(self, to=None, fro=None):
         to = to if to else self.children[-1]
         fro = fro if fro else self.children[0]
-        scopechange = 0
-
-        commands = itertools.ifilter(
-            lambda com: com.usable,
-            itertools.takewhile(
-                lambda com: com is not to,
-                itertools.dropwhile(
-                    lambda com: com is not fro,
-                    self.children)))
-        for command in commands:
-            scopechange += command.scopechange
-        return scopechange
+
+        fro_index = self.index_of(fro)
+        if fro_index is None:
+            # We never find where to start
+            return 0
+        to_index = self.index_of(to)
+        if to_index is None or to_index < fro_index:
+            # We never find where to stop, go to the end
+            to_index = len(self.children)
+        return self.get_scope_entry(to_index).level - self.get_scope_entry(fro_index).level
+
+    def index_of(self, command):
+        """
+        Returns where the command is in children, or None if it isn't
+        """
+        index = getattr(command, 'parser_index', None)
+        if index is not None and index < len(self.children) and self.children[index] is command:
+            return index
+        return None
+
+    def invalidate_scopes(self, index):
+        """
+        The child at index changed in a way that could change the scopes
+        of the children after it
+        """
+        self._scopes_valid = min(getattr(self, '_scopes_valid', 0), index + 1)
+
+    def get_scope_entry(self, command):
+        """
+        Returns the ScopeEntry for the scopes just before the command,
+        which can be a command or an index in children.  Commands that
+        aren't children yet are treated as coming after all of them.
+
+        The entries are worked out as they're needed and kept, until the
+        commands they depend on change.  The last child is still being
+        parsed and might change, so the entry after it is always worked
+        out again.
+        """
+        if isinstance(command, (int, long)):
+            index = command
+        else:
+            index = self.index_of(command)
+            if index is None:
+                index = len(self.children)
+
+        entries = getattr(self, '_scope_entries', None)
+        interactivity_enabled = getattr(getattr(self, 'interpreter', None), 'interactivity_enabled', None)
+        if entries is None or interactivity_enabled != self._scope_interactivity:
+            # Whether commands are usable depends on interactivity
+            entries = self._scope_entries = [ScopeEntry()]
+            self._scope_interactivity = interactivity_enabled
+            self._scopes_valid = 1
+        del entries[max(1, self._scopes_valid):]
+
+        while len(entries) <= index:
+            entries.append(entries[-1].after(self.children[len(entries) - 1]))
+        self._scopes_valid = min(len(entries), len(self.children))
+        return entries[index]
+
+    def compact(self, command=None):
+        """
+        Summarizes the children up to and including command, which
+        defaults to the last one, once they've been output.  Scope
+        openers and commands that define variables are kept, because
+        their subjects can still be used, but they let go of their
+        tokens.  The elements they found are let go of when they can no
+        longer be used as a context.
+        """
+        index = self.index_of(command) if command else len(self.children) - 1
+        if index is None:
+            return
+        open_scopes = set(self.get_scope_entry(len(self.children)).scopes)
+
+        for i in xrange(self._compacted, index + 1):
+            child = self.children[i]
+            if child.variable:
+                child.release()
+            elif child.scopechange > 0:
+                child.release()
+                self._holding_elements.append(child)
+            else:
+                self.children[i] = CommandSummary(child)
+        self._compacted = max(self._compacted, index + 1)
+
+        holding = []
+        for child in self._holding_elements:
+            if child in open_scopes:
+                holding.append(child)
+            else:
+                child.release(elements=True)
+        self._holding_elements = holding
+
+    @property
+    def total_scopechange(self):
+        """
+        The sum of the scopechanges of all the children, usable or not
+        """
+        return self.get_scope_entry(len(self.children)).total
 
     def next(self):
         if not self.scanner:
             raise StopIteration()
         tokens = self.scanner.next()
-        self.tokenstream = iter(tokens)
+        self.tokenstream = TokenCursor(tokens)
         return super(VisionParser, self).next()
 
     @property
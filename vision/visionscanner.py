@@ -1,6 +1,10 @@
 # Python libraries
 import sys
 import re
+import array
+import bisect
+import hashlib
+import cPickle
 import itertools
 import copy
 import types
@@ -94,6 +98,10 @@ class BasicTokenizer(object):
     # is returned
     token_transforms = ()
 
+    # Compiled TokenizerTables, keyed by tokenizer class and scanner
+    # class
+    _tables = {}
+
     def __init__(self, scanner=None, commandtype=None):
         self.scanner = scanner
         self.commandtype = commandtype
@@ -112,12 +120,10 @@ class BasicTokenizer(object):
                 # We have a remainder, this is an error
                 start = len(line) - len(remainder)
                 msg = "Parse failure at line %d, starting at character %d: " % (command.lineno, start + 1)
-                compiled_regex = re.compile(self.regexps['whitespace'], re.IGNORECASE)
-                newpos = start + 1
-                while newpos < len(line):
-                    if compiled_regex.match(line[newpos:]):
-                        break
-                    newpos += 1
+
+                # The unrecognized part runs until the next whitespace
+                whitespace_match = self.table.whitespace.search(line, start + 1)
+                newpos = whitespace_match.start() if whitespace_match else len(line)
                 msg += '"%s" was not recognized' % line[start:newpos]
                 raise visionexceptions.GarbageInputError(
                     code=line,
@@ -135,120 +141,252 @@ class BasicTokenizer(object):
         that is the part that could not be tokenized
         """
 
-        start=0
+        try:
+            # We've seen this line before, and know what its tokens are
+            records, indentation = self.scanner.line_records[line]
+            remainder = ''
+        except KeyError, ke:
+            records, remainder = self.scanline_records(line)
+        table = self.table
         tokens = []
+        for token_type, identifier, start in records:
+            emitter, arguments = table.token_mapper[token_type]
+            tokens.append(emitter(
+                identifier=identifier,
+                start=start,
+                scanner_args=arguments))
+        return (tokens, remainder)
+
+    def scanline_records(self, line):
+        """
+        Takes a line of Vision and returns a list of (token type,
+        identifier, start) records that the tokens are made from, and a
+        string that is the part that could not be tokenized.  The records
+        can be saved, so the tokens can be made again without scanning
+        the line.
+        """
+
+        start=0
+        records = []
+        table = self.table
 
         # We're going to save the lines after stripping leading
         # whitespace, we need to get the ammount of offset that'll be so
         # we can tell the tokens their proper start/end postions
         offset = len(line) - len(line.lstrip())
-        compiled_regexes = [re.compile(regex, re.IGNORECASE) for regex in self.regexes]
-        remainder = line
         while start < len(line):
+            # Match at our position in the line, rather than slicing
+            # off the rest of the line for every token
             token_type = None
-            token = None
-            for regex in compiled_regexes:
-                token_match = regex.match(line[start:])
-                try:
-                    match_dict = token_match.groupdict()
-                    token_type = next(itertools.dropwhile(
-                        lambda token_type: not match_dict.get(token_type, None),
-                        self.token_order))
-                    token = match_dict[token_type]
-
-                    # We found a match, call the action and break this loop
-                    self.scanner.token_match_action(token, line[:start])
+            for regex in table.regexes:
+                token_match = regex.match(line, start)
+                if token_match and token_match.lastgroup and token_match.end() > start:
+                    # Each token is its own named group, so the last group
+                    # that matched is the type of token we found
+                    token_type = token_match.lastgroup
+                    token = token_match.group(token_type)
                     break
-                except visionexceptions.GarbageInputError, gie:
-                    # if we got garbage here, reraise
-                    raise
-                except:
-                    # There were no matches, eat this so we can try the
-                    # next one
-                    pass
-            else:
+
+            if token_type is None or table.token_index[token_type] > table.first_keyword:
+                # A keyword may need to be used instead
+                keyword = table.keywords.match(line, start)
+                if keyword and (token_type is None or
+                  table.token_index[keyword[0]] < table.token_index[token_type]):
+                    token_type, end = keyword
+                    token = line[start:end]
+
+            if token_type is None:
                 # We never found a match, this is the remainder
                 break
 
+            # We found a match, call the action
+            self.scanner.token_match_action(token, line[:start])
+
             # We always update our postion in the line
             end = start + len(token)
-            to_emit = None
-            if token_type not in self.ignore:
-                emitter, arguments = self.token_mapper[token_type]
-                to_emit = emitter(
-                    identifier=token,
-                    start=start - offset,
-                    scanner_args=arguments)
+            if token_type not in table.ignore:
+                records.append((token_type, token, start - offset))
             start = end
-            if to_emit:
-                tokens.append(to_emit)
 
-            remainder = line[start:]
-        return (tokens,remainder)
+        return (records, line[start:])
+
+    @classmethod
+    def clear_tables(cls):
+        """
+        Throws away the compiled tables of every tokenizer, so that they
+        are rebuilt with the current tokens the next time they are used.
+        This needs to be called whenever tokens are added or changed.
+        """
+        BasicTokenizer._tables.clear()
+
+    @property
+    def table(self):
+        """
+        The compiled TokenizerTable for this kind of tokenizer when used
+        by this kind of scanner
+        """
+        key = (type(self), type(self.scanner))
+        try:
+            return BasicTokenizer._tables[key]
+        except KeyError, ke:
+            table = BasicTokenizer._tables[key] = TokenizerTable(self)
+            return table
 
     @property
     def regexes(self):
-        if not hasattr(self, '_regexes'):
-            self._regexes = []
-            current = []
-            for i, token in enumerate(self.token_order):
-                regex = self.regexps.get(
-                    token,
-                    "(?P<%s>%s)" % (token, token.replace('_', ' ')))
-                if i and not(100 % i):
-                    # We need another regex, we can only group so many
-                    # at a time
-                    self._regexes.append('|'.join(current))
-                    current = []
-                current.append(regex)
-            self._regexes.append('|'.join(current))
-        return self._regexes
+        return self.table.regexes
 
     @property
     def ignore(self):
-        return self.sugar + self.seperators
+        return self.table.ignore
 
     def get_regexps(self):
         return copy.deepcopy(BasicTokenizer.REs)
 
     @property
     def regexps(self):
-        regexps = self.get_regexps()
-        regexps.update(
-            self.scanner.get_regexps() if self.scanner else {})
-        return regexps
+        return self.table.regexps
 
     def get_token_mapper(self):
         return copy.deepcopy(BasicTokenizer.tokens)
 
     @property
     def token_mapper(self):
-        token_mapper = self.get_token_mapper()
-        token_mapper.update(
-            self.scanner.get_token_mapper() if self.scanner else {})
-        for transform in self.token_transforms:
-            transform(token_mapper)
-        return token_mapper
+        return self.table.token_mapper
 
     @property
     def token_order(self):
         """
         This is the order in which we need to look for tokens
         """
+        return self.table.token_order
+
+class TokenizerTable(object):
+    """
+    The regexes and token mappings a tokenizer uses to split lines.
 
-        if not hasattr(self, '_token_order'):
-            _token_order = collections.OrderedDict()
-            tokens_tuple = (
-                self.before_keywords,
-                tuple(self.regexps),
-                tuple(self.token_mapper),
-                self.after_keywords,
-                self.sugar)
-            for t in itertools.chain.from_iterable(
-              [sorted(toks, key=len, reverse=True) for toks in tokens_tuple]):
-                _token_order[t] = True
-            self._token_order = tuple(_token_order)
-        return self._token_order
+    Building these means deep copying the token dicts and compiling
+    every regex, so it is done once for each combination of tokenizer
+    class and scanner class, and the result is shared by all of those
+    tokenizers.  Nothing here should be modified; use
+    BasicTokenizer.clear_tables to have them rebuilt.
+    """
+
+    # The re module can only handle 100 groups in one regex, and one of
+    # those is the whole match
+    maximum_groups = 99
+
+    def __init__(self, tokenizer):
+        scanner = tokenizer.scanner
+
+        self.regexps = tokenizer.get_regexps()
+        self.regexps.update(
+            scanner.get_regexps() if scanner else {})
+
+        self.token_mapper = tokenizer.get_token_mapper()
+        self.token_mapper.update(
+            scanner.get_token_mapper() if scanner else {})
+        for transform in tokenizer.token_transforms:
+            transform(self.token_mapper)
+
+        self.ignore = frozenset(tokenizer.sugar + tokenizer.seperators)
+
+        # This is the order in which we need to look for tokens
+        token_order = collections.OrderedDict()
+        tokens_tuple = (
+            tokenizer.before_keywords,
+            tuple(self.regexps),
+            tuple(self.token_mapper),
+            tokenizer.after_keywords,
+            tokenizer.sugar)
+        for t in itertools.chain.from_iterable(
+          [sorted(toks, key=len, reverse=True) for toks in tokens_tuple]):
+            token_order[t] = True
+        self.token_order = tuple(token_order)
+
+        # Keywords are found with a trie, everything else is a regex
+        self.token_index = dict(
+            (token, i) for i, token in enumerate(self.token_order))
+        keywords = [
+            token for token in self.token_order if token not in self.regexps]
+        self.keywords = KeywordTrie(keywords)
+        self.first_keyword = (
+            self.token_index[keywords[0]] if keywords else len(self.token_order))
+
+        # Put the regexes into as few alternations as we can.  An
+        # alternation tries its tokens in order, so this keeps the order
+        # we need to look for tokens in
+        regexes = []
+        current = []
+        groups = 0
+        for token in self.token_order:
+            if token not in self.regexps:
+                continue
+            regex = self.regexps[token]
+            regex_groups = re.compile(regex).groups
+            if current and groups + regex_groups > self.maximum_groups:
+                # We need another regex, we can only group so many
+                # at a time
+                regexes.append('|'.join(current))
+                current = []
+                groups = 0
+            current.append(regex)
+            groups += regex_groups
+        if current:
+            regexes.append('|'.join(current))
+        self.regexes = tuple(
+            re.compile(regex, re.IGNORECASE) for regex in regexes)
+        self.whitespace = re.compile(self.regexps['whitespace'], re.IGNORECASE)
+
+        # This changes whenever the way this table splits lines could
+        # change, so saved token records can be checked against it
+        self.fingerprint = hashlib.sha1(repr((
+            self.token_order,
+            sorted(self.regexps.items()),
+            sorted(self.ignore)))).hexdigest()
+
+class KeywordTrie(object):
+    """
+    Finds keywords at a position in a line, ignoring case.
+
+    Each character of a keyword is a level of the trie, so finding a
+    keyword only takes as long as the keyword, no matter how many
+    keywords there are.  Underscores in the keywords match spaces, like
+    'should_contain' matches 'should contain'.
+    """
+
+    def __init__(self, keywords):
+        """
+        Keywords are given in the order they should be preferred in,
+        when more than one of them is at the start of the text
+        """
+        self.root = {}
+        for order, keyword in enumerate(keywords):
+            node = self.root
+            for character in keyword.replace('_', ' ').lower():
+                node = node.setdefault(character, {})
+            # The empty string can't be a character, so it marks where
+            # keywords end
+            node.setdefault('', (order, keyword))
+
+    def match(self, line, start=0):
+        """
+        Returns the keyword at start in the line, and where it ends in
+        the line.  If more than one keyword is there, the one given
+        first wins.  None is returned if there's no keyword there.
+        """
+        found = None
+        node = self.root
+        for position in xrange(start, len(line)):
+            node = node.get(line[position].lower())
+            if node is None:
+                break
+            if '' in node and (found is None or node[''] < found[0]):
+                found = (node[''], position + 1)
+        if found:
+            (order, keyword), end = found
+            return keyword, end
+        return None
 
 class VisionScanner(object):
     """
@@ -266,6 +404,10 @@ class VisionScanner(object):
         self.position = 0
         self.maximum_time=maximum_time
         self.allowable_time=allowable_time
+
+        # The token records of lines we already know, keyed by line,
+        # with how far each line is indented
+        self.line_records = {}
         tokenizer.scanner = self
 
     def __iter__(self):
@@ -306,13 +448,14 @@ class VisionScanner(object):
         command = self.commandtype(
             scanner=self,
             lineno=self.position + 1)
-        line_iter = iter(self.lines[self.position:])
         line = ''
         exception = None
         while not line:
             # read until there's a non-blank line
             # or we run out of lines
-            line = self.format_line(next(line_iter))
+            if self.done:
+                raise StopIteration()
+            line = self.format_line(self.lines[self.position])
             exception = None
             try:
                 if line:
@@ -326,8 +469,12 @@ class VisionScanner(object):
                 raise
             except Exception as e:
                 command = e.command = getattr(e, 'command', command)
-                if command and command not in token_list:
-                    token_list.insert(0, command)
+                if command:
+                    # Keep why the line couldn't be scanned, since the
+                    # parser can only tell that it has no tokens
+                    command.error = e
+                    if command not in token_list:
+                        token_list.insert(0, command)
         return token_list
 
     def advance(self, lines=1):
@@ -361,7 +508,10 @@ class VisionFileScanner(VisionScanner):
         'whitespace': '(?P<whitespace>[ \n])',
     }
 
-    def __init__(self, filish, tokenizer, filename=None, subcommand=False, parser=None, *args, **kwargs):
+    # Change this whenever the format of the parse cache changes
+    cache_version = 1
+
+    def __init__(self, filish, tokenizer, filename=None, subcommand=False, parser=None, cache_dir=None, *args, **kwargs):
         file_name = filename or filish.name
         super(VisionFileScanner, self).__init__(
             name=file_name,
@@ -369,7 +519,107 @@ class VisionFileScanner(VisionScanner):
             tokenizer=tokenizer,
             *args,
             **kwargs)
-        self.addline(filish)
+        self.cache_dir = cache_dir
+
+        # How far each line is indented, and the numbers of the lines
+        # that have each type of token
+        self.indentation = []
+        self.token_lines = collections.defaultdict(list)
+
+        self.lines = LineStore(
+            filish.read() if hasattr(filish, 'read') else ''.join(filish))
+        if cache_dir:
+            cache_path = self.get_cache_path()
+            cached = self.load_line_records(cache_path)
+            self.index_lines()
+            if not cached:
+                self.save_line_records(cache_path)
+        else:
+            self.index_lines()
+
+    def get_cache_path(self):
+        """
+        The token records of a file are saved in the cache_dir, keyed by
+        the contents of the file and the tokens the tokenizer knows
+        about, so a file that hasn't changed doesn't need to be scanned
+        again.
+        """
+        key = hashlib.sha1()
+        key.update('%s:%s:' % (self.cache_version, self.tokenizer.table.fingerprint))
+        key.update(self.lines.text)
+        return os.path.join(self.cache_dir, key.hexdigest() + '.pickle')
+
+    def load_line_records(self, cache_path):
+        """
+        Fills line_records from the cache.  Returns whether there was a
+        usable cache.
+        """
+        try:
+            with open(cache_path, 'rb') as cache_file:
+                self.line_records = cPickle.load(cache_file)
+            return True
+        except Exception as e:
+            # There's no usable cache for this file, so we'll scan it
+            # and make one
+            return False
+
+    def save_line_records(self, cache_path):
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+
+            # Write to a temporary file first, so no one reads half of
+            # a cache file
+            temporary_path = '%s.%d' % (cache_path, os.getpid())
+            with open(temporary_path, 'wb') as cache_file:
+                cPickle.dump(self.line_records, cache_file, cPickle.HIGHEST_PROTOCOL)
+            os.rename(temporary_path, cache_path)
+        except (IOError, OSError, cPickle.PicklingError) as e:
+            # We couldn't save the cache, we'll just scan the file again
+            # next time
+            pass
+
+    def index_lines(self, start=0):
+        """
+        Works out how far each line from start on is indented and which
+        types of tokens it has, so breakpoints and scope levels don't
+        need to scan the lines again.
+        """
+        if not start:
+            self.indentation = []
+            self.token_lines = collections.defaultdict(list)
+        line_info = {}
+        for i in xrange(start, len(self.lines)):
+            code = VisionScanner.format_line(self, self.lines[i]['code'])
+            if code not in line_info:
+                line_info[code] = self.get_line_info(code)
+            indentation, token_types = line_info[code]
+            self.indentation.append(indentation)
+            for token_type in token_types:
+                self.token_lines[token_type].append(i)
+
+    def get_line_info(self, code):
+        """
+        Returns how far the line is indented and the set of the types of
+        its tokens, as they're named in the tokenizer's token_mapper.
+        Lines that can't be scanned have no tokens.
+        """
+        if code not in self.line_records:
+            try:
+                records, remainder = self.tokenizer.scanline_records(code)
+            except visionexceptions.VisionException as ve:
+                # The line is bad, it will be reported when we get to it
+                return 0, ()
+            if remainder or not code:
+                return 0, ()
+            table = self.tokenizer.table
+            indentation = len(list(itertools.takewhile(
+                lambda record:issubclass(table.token_mapper[record[0]][0], visionparser.ScopeChange),
+                records)))
+            self.line_records[code] = (records, indentation)
+
+        records, indentation = self.line_records[code]
+        return indentation, set(record[0] for record in records)
 
     def next(self):
         command = None
@@ -381,7 +631,8 @@ class VisionFileScanner(VisionScanner):
             exception = si
             raise
         except Exception as e:
-            import traceback;traceback.print_exc()
+            if self.parser.interpreter.debug:
+                import traceback;traceback.print_exc()
             exception = e
             raise
         finally:
@@ -444,12 +695,15 @@ class VisionFileScanner(VisionScanner):
         return [command] + tokens
 
     def addline(self, newlines):
-        super(VisionFileScanner, self).addline(
-            {'breakpoint': False, 'code': line} for line in newlines)
+        start = len(self.lines)
+        self.lines.extend(newlines)
+        self.index_lines(start)
 
     def insertline(self, newlines):
-        super(VisionFileScanner, self).insertline(
-            {'breakpoint': False, 'code': line} for line in newlines)
+        self.lines.insert(self.position, newlines)
+
+        # The lines after the new ones have moved
+        self.index_lines()
 
     def get_line(self):
         line = tokens = None
@@ -483,14 +737,14 @@ class VisionFileScanner(VisionScanner):
 
     def toggle_token_breakpoint(self, token_type):
         found = False
-        if "_".join(token_type.split()) in self.tokenizer.token_mapper:
+        token_name = "_".join(token_type.split())
+        if token_name in self.tokenizer.token_mapper:
             # Toggle the breakpoint for each line with
             # this kind of token, if there are any lines
-            for (i, line) in itertools.dropwhile(lambda pair, start=self.position: pair[0] < start, enumerate(self.lines)):
-                tokens, remainder = self.tokenizer.scanline_with_remainder(line['code'])
-                if not remainder and [tok for tok in tokens if tok.type == token_type]:
-                    self.toggle_breakpoint(i + 1)
-                    found = True
+            token_lines = self.token_lines.get(token_name, [])
+            for i in token_lines[bisect.bisect_left(token_lines, self.position):]:
+                self.toggle_breakpoint(i + 1)
+                found = True
             if not found:
                 raise visionexceptions.VisionException(
                     message="'%s' does not contain token type '%s' after line %d" % (
@@ -518,12 +772,108 @@ class VisionFileScanner(VisionScanner):
     def scope_level(self):
         for command in reversed(self.parser.children):
             if command.usable and (command.scanner is self):
-                return len(list(itertools.takewhile(
-                    lambda tok:isinstance(tok, visionparser.ScopeChange),
-                    self.scanline(self.lines[command.lineno - 1], command.lineno))))
+                return self.indentation[command.lineno - 1]
         else:
             return 0
 
+class LineStore(object):
+    """
+    The lines of a file, without an object for every line.
+
+    The text of the file is kept as one string, with the offsets of the
+    starts of its lines in an array.  Lines added later are kept in a
+    list of their own.  The order of the lines is an array of references
+    to those, so inserting lines doesn't copy any of them.  Breakpoints
+    are a flag per line in a bytearray.
+
+    Indexing gives a Line, which can be used like the dicts of
+    {'breakpoint', 'code'} this replaces.
+    """
+
+    def __init__(self, text=''):
+        self.text = text
+
+        # The start of each line of the text, and then the end of the
+        # text
+        self.offsets = array.array('l', [0])
+        newline = text.find('\n')
+        while newline != -1:
+            self.offsets.append(newline + 1)
+            newline = text.find('\n', newline + 1)
+        if self.offsets[-1] != len(text):
+            # The last line doesn't end with a newline
+            self.offsets.append(len(text))
+
+        # Lines that aren't from the text
+        self.added = []
+
+        # Lines from the text are referenced by their number, added
+        # lines by -1 - their index in added
+        self.references = array.array('l', xrange(len(self.offsets) - 1))
+        self.breakpoints = bytearray(len(self.references))
+
+    def __len__(self):
+        return len(self.references)
+
+    def __iter__(self):
+        return (Line(self, index) for index in xrange(len(self)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Line(self, i) for i in xrange(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("line index out of range")
+        return Line(self, index)
+
+    def code(self, index):
+        reference = self.references[index]
+        if reference < 0:
+            return self.added[-1 - reference]
+        return self.text[self.offsets[reference]:self.offsets[reference + 1]]
+
+    def get_references(self, lines):
+        references = array.array('l')
+        for line in lines:
+            self.added.append(line)
+            references.append(-len(self.added))
+        return references
+
+    def extend(self, lines):
+        references = self.get_references(lines)
+        self.references.extend(references)
+        self.breakpoints.extend(bytearray(len(references)))
+
+    def insert(self, index, lines):
+        references = self.get_references(lines)
+        self.references[index:index] = references
+        self.breakpoints[index:index] = bytearray(len(references))
+
+class Line(object):
+    """
+    A line in a LineStore, with 'code' and 'breakpoint' keys
+    """
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        if key == 'code':
+            return self.store.code(self.index)
+        elif key == 'breakpoint':
+            return bool(self.store.breakpoints[self.index])
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'breakpoint':
+            self.store.breakpoints[self.index] = bool(value)
+        else:
+            raise KeyError(key)
+
 class InteractiveTokenizer(BasicTokenizer):
     """
     This is a tokenizer that knows how to handle tokens specific to
@@ -586,7 +936,7 @@ class InteractiveVisionScanner(VisionScanner):
                     tokens[0].origin_scanner = next(
                         com.origin_scanner
                         for com in reversed(self.parser.children)
-                        if com.verb and not isinstance(com.verb, visionparser.InterpreterVerb))
+                        if com.verb and not com.for_interpreter)
                 except StopIteration as si:
                     # there wasn't a previous command.
                     pass